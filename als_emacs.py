@@ -19,6 +19,15 @@ import sublime
 import sublime_plugin
 
 from enum import Enum
+from collections import OrderedDict, deque
+import concurrent.futures
+import copy
+import functools
+import array
+import base64
+import bisect
+import re
+import time
 import traceback #debug
 
 import subprocess
@@ -26,6 +35,12 @@ import sys
 
 from pathlib import Path
 import os
+import hashlib
+import json
+import mmap
+import pickle
+import queue
+import threading
 
 # --- Logging
 
@@ -38,34 +53,269 @@ LOG_EVENTS				= None #or "event listener"
 LOG_ISEARCH				= None #or "i-search"
 LOG_BUILD				= None #or "build"
 LOG_MARK_RING			= None #or "mark-ring"
+LOG_PROJECT_INDEX		= None #or "project-index"
+LOG_GREP				= None #or "grep"
+
+LOG_FILE_NAME			= 'plugin_trace.txt'
+LOG_FILE_MAX_BYTES		= 4 * 1024 * 1024	# NOTE - Rotated to plugin_trace.txt.1, .2, ... once it grows past this
+LOG_FILE_BACKUP_CT		= 3
+LOG_RING_SIZE			= 8192				# NOTE - Oldest records are dropped if the writer falls this far behind
+LOG_FLUSH_MS			= 250
 
 def plugin_loaded():
 	if LOG_TO_FILE:
-		with open('plugin_trace.txt','w') as file:
+		with open(LOG_FILE_NAME,'w') as file:
 			pass	# NOTE - Clears file
 
-def trace(tag, text):
+	StateSweep.start()
+
+def plugin_unloaded():
+	StateSweep.stop()
+	WarmWorker.stopAll()
+	RegexWorker.stopAll()
+	GrepWorker.stopAll()
+	TraceLog.stop()
+
+def trace(tag, text, *args):
+	# NOTE - Call sites pass format args instead of building the string themselves, so a disabled tag costs one
+	#  truthiness check. Formatting happens here, since args (e.g. a command's args dict) can change after we return.
+	#  Only the file I/O happens on the writer thread.
 	if tag:
+		try:
+			message = text.format(*args) if args else str(text)
+		except Exception as e:
+			message = f"{text!r} {args!r} (format failed: {e})"
+
+		TraceLog.push(tag, message)
+
+class TraceLog():
+	records = deque(maxlen=LOG_RING_SIZE)
+	droppedCt = 0
+	wakeup = threading.Event()
+	stopping = False
+	writer = None
+	file = None
+	epoch = time.monotonic()
+
+	@staticmethod
+	def push(tag, message):
+		records = TraceLog.records
+		if len(records) == records.maxlen:
+			TraceLog.droppedCt += 1
+
+		records.append((time.monotonic(), tag, message))
+
+		if TraceLog.writer is None and not TraceLog.stopping:
+			TraceLog.writer = threading.Thread(target=TraceLog.run, name="als trace writer", daemon=True)
+			TraceLog.writer.start()
+
+	@staticmethod
+	def run():
+		while not TraceLog.stopping:
+			TraceLog.wakeup.wait(LOG_FLUSH_MS / 1000)
+			TraceLog.flush()
+
+		TraceLog.flush()
+		TraceLog.closeFile()
+
+	@staticmethod
+	def stop():
+		TraceLog.stopping = True
+		TraceLog.wakeup.set()
+		if TraceLog.writer is not None:
+			TraceLog.writer.join(timeout=1)
+			TraceLog.writer = None
+
+		TraceLog.flush()
+		TraceLog.closeFile()
+
+	@staticmethod
+	def flush():
+		lines = []
+		records = TraceLog.records
+		while records:
+			try:
+				timestamp, tag, message = records.popleft()
+			except IndexError:
+				break
+
+			if LOG_TO_FILE:
+				lines.append(f"{timestamp - TraceLog.epoch:.3f} :::: [{tag}] {message}\n")
+			else:
+				lines.append(message)
+
+		if TraceLog.droppedCt:
+			note = f"... dropped {TraceLog.droppedCt} trace record(s), writer fell behind"
+			TraceLog.droppedCt = 0
+			lines.append(note + "\n" if LOG_TO_FILE else note)
+
+		if not lines:
+			return
+
 		if LOG_TO_FILE:
-			# SLOW - opening file every time we log, lol
-			with open('plugin_trace.txt', 'a') as file:
-				timestamp = time.time()
-				timestamp %= 100
-				timestamp *= 1000
-				timestamp = round(timestamp)
-				timestamp /= 1000
-				file.write(f"{timestamp} :::: [{tag}] {text}\n")
+			try:
+				TraceLog.write("".join(lines))
+			except OSError as e:
+				print(f"trace: failed to write {LOG_FILE_NAME}: {e}")
+		else:
+			print("\n".join(lines))
+
+	@staticmethod
+	def write(text):
+		if TraceLog.file is None:
+			TraceLog.file = open(LOG_FILE_NAME, 'a')
+
+		TraceLog.file.write(text)
+		TraceLog.file.flush()
+
+		if TraceLog.file.tell() >= LOG_FILE_MAX_BYTES:
+			TraceLog.rotate()
+
+	@staticmethod
+	def rotate():
+		TraceLog.closeFile()
+		for i in range(LOG_FILE_BACKUP_CT - 1, 0, -1):
+			older = f"{LOG_FILE_NAME}.{i}"
+			if os.path.exists(older):
+				os.replace(older, f"{LOG_FILE_NAME}.{i + 1}")
+
+		if LOG_FILE_BACKUP_CT > 0:
+			os.replace(LOG_FILE_NAME, f"{LOG_FILE_NAME}.1")
 		else:
-			print(text)
+			os.remove(LOG_FILE_NAME)
+
+	@staticmethod
+	def closeFile():
+		if TraceLog.file is not None:
+			TraceLog.file.close()
+			TraceLog.file = None
+
+# --- Latency instrumentation
+
+LOG_LATENCY_BUDGET		= None #or "latency budget"
+
+LATENCY_BUDGET_MS		= 16				# NOTE - About one frame. Hooks that take longer are flagged
+LATENCY_PANEL_NAME		= "als_latency"
+LATENCY_BUCKET_MIN_MS	= 0.01
+LATENCY_BUCKET_MAX_MS	= 10000
+LATENCY_BUCKETS_PER_2X	= 4					# NOTE - Bucket edges grow by 2^(1/4), so percentiles are within ~19%
+
+def makeLatencyBucketEdges():
+	edges = []
+	edge = LATENCY_BUCKET_MIN_MS
+	while edge < LATENCY_BUCKET_MAX_MS:
+		edges.append(edge)
+		edge *= 2 ** (1 / LATENCY_BUCKETS_PER_2X)
+
+	return edges
+
+class LatencyStats():
+	dictionary = {}
+	bucketEdges = makeLatencyBucketEdges()
+
+	def __init__(self, name):
+		self.name = name
+		self.reset()
+
+	def reset(self):
+		self.callCt = 0
+		self.overBudgetCt = 0
+		self.maxMs = 0
+		self.buckets = [0] * (len(LatencyStats.bucketEdges) + 1)	# NOTE - Last bucket catches everything past the max edge
+
+	@staticmethod
+	def get(name):
+		result = LatencyStats.dictionary.get(name)
+		if result is None:
+			result = LatencyStats(name)
+			LatencyStats.dictionary[name] = result
+
+		return result
+
+	def record(self, ms):
+		self.callCt += 1
+		self.maxMs = max(self.maxMs, ms)
+		self.buckets[bisect.bisect_left(LatencyStats.bucketEdges, ms)] += 1
+
+		if ms > LATENCY_BUDGET_MS:
+			self.overBudgetCt += 1
+			trace(LOG_LATENCY_BUDGET, "{} took {:.1f}ms (budget {}ms)", self.name, ms, LATENCY_BUDGET_MS)
+
+	def percentile(self, p):
+		# NOTE - Reports the upper edge of the bucket the percentile lands in
+		target = self.callCt * p / 100
+		runningCt = 0
+		for i, ct in enumerate(self.buckets):
+			runningCt += ct
+			if runningCt >= target and ct:
+				if i < len(LatencyStats.bucketEdges):
+					return min(LatencyStats.bucketEdges[i], self.maxMs)
+				return self.maxMs
+
+		return self.maxMs
+
+	@staticmethod
+	def report():
+		stats = [s for s in LatencyStats.dictionary.values() if s.callCt]
+		stats.sort(key=lambda s: s.percentile(99), reverse=True)
+		lines = [f"Latency per hook, worst p99 first (budget {LATENCY_BUDGET_MS}ms, ! = went over)\n\n"]
+		lines.append(f"  {'hook':<56}{'calls':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'over':>7}\n")
+		for s in stats:
+			flag = "!" if s.overBudgetCt else " "
+			lines.append(
+				f"{flag} {s.name:<56}{s.callCt:>8}"
+				f"{s.percentile(50):>10.2f}{s.percentile(95):>10.2f}{s.percentile(99):>10.2f}{s.maxMs:>10.2f}"
+				f"{s.overBudgetCt:>7}\n")
+
+		if not stats:
+			lines.append("  (nothing recorded yet)\n")
+
+		return "".join(lines)
+
+def instrumented(function):
+	stats = LatencyStats.get(function.__qualname__)
+
+	@functools.wraps(function)		# NOTE - Keeps the signature visible to sublime_plugin's argument introspection
+	def wrapper(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			stats.record((time.perf_counter() - start) * 1000)
+
+	return wrapper
+
+class AlsShowLatencyStats(sublime_plugin.WindowCommand):
+	@instrumented
+	def run(self, reset=False):
+		if reset:
+			for stats in LatencyStats.dictionary.values():
+				stats.reset()
+			sublime.status_message("latency stats cleared")
+			return
+
+		panel = self.window.create_output_panel(LATENCY_PANEL_NAME)
+		panel.run_command("append", { "characters": LatencyStats.report() })
+		self.window.run_command("show_panel", { "panel": f"output.{LATENCY_PANEL_NAME}" })
+
 
 # --- Extra state stored per view
 
 class ViewEx():
 	dictionary = {}
 
+	__slots__ = ("view", "_markSel")
+
 	def __init__(self, view):
 		self.view = view
-		self.markSel = MarkSel(view)
+		self._markSel = None		# NOTE - Created on first use. Most panels and transient views never need one
+
+	@property
+	def markSel(self):
+		if self._markSel is None:
+			self._markSel = MarkSel(self.view)
+
+		return self._markSel
 
 	@staticmethod
 	def get(view):
@@ -76,24 +326,56 @@ class ViewEx():
 
 		return result
 
-	def onClose(self):
-		# TODO - Hook this callback up to either on_close(..) or on_pre_close(..)
-		ViewEx.dictionary.pop(self.view.id())
+	@staticmethod
+	def evict(viewId):
+		ViewEx.dictionary.pop(viewId, None)
 
 	def entireViewRegion(self):
 		result = sublime.Region(0, self.view.size())
 		return result
 
 
+# --- Extra state stored per buffer (shared between every view of it, e.g. the mirrored views from sync_views)
+
+class BufferEx():
+	dictionary = {}
+
+	__slots__ = ("buffer", "iSearchMatches", "allViewsMatches")
+
+	def __init__(self, buffer):
+		self.buffer = buffer
+		self.iSearchMatches = None		# NOTE - Drawn in every view of the buffer, so none of them need their own find_all(..)
+		self.allViewsMatches = None		# NOTE - Last all-views scan of this buffer. Kept here rather than in the shared match
+										#  cache, which would evict them once more buffers are open than it has room for
+
+	@staticmethod
+	def get(view):
+		result = BufferEx.dictionary.get(view.buffer_id())
+		if result is None:
+			result = BufferEx(view.buffer())
+			BufferEx.dictionary[view.buffer_id()] = result
+
+		return result
+
+	def views(self):
+		return self.buffer.views()
+
+
 # --- Extra state stored per view window
 
 class WindowEx():
 	dictionary = {}
 
+	__slots__ = ("window", "iSearch", "inputPanel", "projectSearch", "grep", "builds", "statusViews")
+
 	def __init__(self, window):
 		self.window = window
 		self.iSearch = ISearch(window)
 		self.inputPanel = InputPanel(window)
+		self.projectSearch = ProjectSearch(window)
+		self.grep = Grep(window)
+		self.builds = BuildScheduler(window)
+		self.statusViews = {}		# NOTE - Status key -> view it was last set on, so it can be erased even after focus moves
 
 	@staticmethod
 	def get(window):
@@ -104,22 +386,76 @@ class WindowEx():
 
 		return result
 
-	def onClose(self):
-		# TODO - Hook this callback up to either on_close(..) or on_pre_close(..)
-		WindowEx.dictionary.pop(self.window.id())
+	@staticmethod
+	def evict(windowId):
+		WindowEx.dictionary.pop(windowId, None)
 
-	def showCustomStatus(self, text):
+	def showCustomStatus(self, text, key="als_custom"):
 		# HMM - Should we set it for all views? Weird that this is something we set per-view, despite being displayed per-window
 		#	What about new views that get created afterwards...?
 		view = self.window.active_view()
+		if view is None:
+			return
+
+		previous = self.statusViews.get(key)
+		if previous is not None and previous.id() != view.id():
+			self.eraseStatus(previous, key)
+
+		self.statusViews[key] = view
 		view.set_status("als_padding", "------------------------")	# Unsure how to remove sublime's line/column text in the status bar`.... so I'll at least separate it from my statuses!
-		view.set_status("als_custom", text)
+		view.set_status(key, text)
 
-	def clearCustomStatus(self):
+	def clearCustomStatus(self, key="als_custom"):
 		# HMM - Should we set it for all views? Weird that this is something we set per-view, despite being displayed per-window
-		view = self.window.active_view()
-		view.erase_status("als_padding")
-		view.erase_status("als_custom")
+		view = self.statusViews.pop(key, None) or self.window.active_view()
+		if view is not None:
+			self.eraseStatus(view, key)
+
+	def eraseStatus(self, view, key):
+		view.erase_status(key)
+		if not any(other.id() == view.id() for k, other in self.statusViews.items() if k != key):
+			view.erase_status("als_padding")		# NOTE - Only once none of our statuses are left on it
+
+
+# --- State lifetime
+
+STATE_SWEEP_INTERVAL_MS	= 60 * 1000		# NOTE - Backstop for views/windows whose close events we never saw
+
+class StateSweep():
+	token = 0
+
+	@staticmethod
+	def start():
+		StateSweep.token += 1
+		token = StateSweep.token
+		sublime.set_timeout(lambda: StateSweep.run(token), STATE_SWEEP_INTERVAL_MS)
+
+	@staticmethod
+	def stop():
+		StateSweep.token += 1
+
+	@staticmethod
+	def run(token):
+		if token != StateSweep.token:
+			return
+
+		# NOTE - Runs on the main thread, like everything else that touches these dictionaries
+		deadViewIds = [id for id, viewEx in ViewEx.dictionary.items() if not viewEx.view.is_valid()]
+		for id in deadViewIds:
+			ViewEx.evict(id)
+
+		deadBufferIds = [id for id, bufferEx in BufferEx.dictionary.items() if not bufferEx.views()]
+		for id in deadBufferIds:
+			BufferEx.dictionary.pop(id, None)
+
+		deadWindowIds = [id for id, windowEx in WindowEx.dictionary.items() if not windowEx.window.is_valid()]
+		for id in deadWindowIds:
+			WindowEx.evict(id)
+
+		if deadViewIds or deadBufferIds or deadWindowIds:
+			trace(LOG_INIT, "swept {} view(s), {} buffer(s), {} window(s)", len(deadViewIds), len(deadBufferIds), len(deadWindowIds))
+
+		sublime.set_timeout(lambda: StateSweep.run(token), STATE_SWEEP_INTERVAL_MS)
 
 
 # --- Mark/selection (similar to 'transient-mark-mode' in emacs)
@@ -139,6 +475,8 @@ class MarkSel():
 	def get(view):
 		return ViewEx.get(view).markSel
 
+	__slots__ = ("view", "selection", "hiddenSelRegion", "mark", "wantIgnoreModification", "wantKeepMark")
+
 	def __init__(self, view):
 		self.view = view
 		self.selection = view.sel()
@@ -435,6 +773,7 @@ class MarkSel():
 
 class AlsSetMark(sublime_plugin.TextCommand):
 
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 
@@ -444,28 +783,33 @@ class AlsSetMark(sublime_plugin.TextCommand):
 			markSel.placeMark(SelectionAction.CLEAR)
 
 class AlsCycleMarkPrev(sublime_plugin.TextCommand):
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 		markSel.cycleMarkPrev()
 
 class AlsCycleMarkNext(sublime_plugin.TextCommand):
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 		markSel.cycleMarkNext()
 
 class AlsDebugTraceMarkRing(sublime_plugin.TextCommand):
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 		markSel.debugTraceMarkRing()
 
 class AlsClearSelection(sublime_plugin.TextCommand):
 
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 		markSel.clearAll()
 
 class AlsReverseSelection(sublime_plugin.TextCommand):
 
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 		markSel.select(MarkSel.reverseRegion(markSel.primaryRegion()), MarkAction.SET)
@@ -473,6 +817,7 @@ class AlsReverseSelection(sublime_plugin.TextCommand):
 class AlsInflateSelectionToFillLines(sublime_plugin.TextCommand):
 
 	"""Inflates the selection (and the mark) to the beginning/end of the lines at the beginning/end of the selection"""
+	@instrumented
 	def run(self, edit):
 		markSel = MarkSel.get(self.view)
 
@@ -491,11 +836,13 @@ def ensureTwoGroups(window):
 		window.focus_group(0)	# predictable landing place if we end up having to modify layout!
 
 class AlsOtherView(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
 		ensureTwoGroups(self.window)
 		self.window.focus_group(1 if self.window.active_group() == 0 else 0)
 
 class AlsTransposeViews(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
 
 		if self.window.num_groups() != 2:
@@ -520,6 +867,7 @@ class AlsCppOpenComplementaryFileInOppositeView(sublime_plugin.WindowCommand):
 
 		return None
 
+	@instrumented
 	def run(self):
 		filename = self.window.active_view().file_name()
 
@@ -547,34 +895,1058 @@ class AlsCppOpenComplementaryFileInOppositeView(sublime_plugin.WindowCommand):
 			# TODO - verify that this succeeds? If getComplementaryFilenameIfExists does its job, it should...
 			self.window.open_file(complementaryFilename)
 
-def findAndRunScript_inCurrentDirectory_orParent(activeView, command_name, script_name):
-	fileName = activeView.file_name()
-	if fileName:
-		directory = Path(activeView.file_name())
-		if not directory.is_dir():
-			directory = directory.parent
+# --- Build/run scripts
+#		Scripts run in a background process and stream into an output panel, so a long build doesn't freeze the editor
+
+BUILD_PANEL_NAME			= "als_build"
+BUILD_FLUSH_MS				= 100
+BUILD_MAX_PENDING_LINES		= 5000		# NOTE - If the panel can't keep up, the oldest unflushed lines are dropped (and counted)
+BUILD_MAX_RUNNING_JOBS		= 2			# NOTE - Per window. Anything past this waits in the queue
+BUILD_STATUS_KEY			= "als_build"
+BUILD_STATUS_LINGER_MS		= 5000		# NOTE - How long the result of the last job stays in the status bar
+
+# --- Build up-to-date check
+#		Opt-in (skip_if_up_to_date). After a successful build we record (size, mtime, hash) of everything under the script's
+#		directory, next to the script. The next build only re-hashes files whose stat changed, and is skipped if nothing did.
+
+BUILD_MANIFEST_SUFFIX		= ".als-manifest"
+BUILD_MANIFEST_VERSION		= 1
+BUILD_MANIFEST_MAX_FILES	= 50000		# NOTE - Past this we don't bother, the scan would cost more than it saves
+BUILD_MANIFEST_CHUNK_SIZE	= 1024 * 1024
+
+class BuildManifest():
+
+	@staticmethod
+	def path(scriptFile):
+		return str(scriptFile) + BUILD_MANIFEST_SUFFIX
+
+	@staticmethod
+	def load(scriptFile, command_name):
+		try:
+			with open(BuildManifest.path(scriptFile), "rb") as file:
+				version, manifestCommand, files = pickle.load(file)
+		except Exception:
+			return None		# NOTE - Missing/corrupt/old manifest, so not up to date
+
+		if version != BUILD_MANIFEST_VERSION or manifestCommand != command_name:
+			return None
+
+		return files
+
+	@staticmethod
+	def hashFile(path):
+		digest = hashlib.sha1()
+		with open(path, "rb") as file:
+			for chunk in iter(lambda: file.read(BUILD_MANIFEST_CHUNK_SIZE), b""):
+				digest.update(chunk)
+
+		return digest.hexdigest()
+
+	@staticmethod
+	def scan(scriptFile, previous, stopAtFirstChange):
+		"""Returns { relative path: (size, mtime_ns, hash) } for the script's directory, or None if it's too big or
+		stopAtFirstChange is set and something differs from previous"""
+		directory = str(scriptFile.parent)
+		manifestPath = os.path.normcase(BuildManifest.path(scriptFile))
+		previous = previous or {}
+
+		files = {}
+		for dirPath, dirNames, fileNames in os.walk(directory):
+			dirNames[:] = [dirName for dirName in dirNames if dirName not in PROJECT_INDEX_SKIP_DIRS]
+			for fileName in fileNames:
+				path = os.path.join(dirPath, fileName)
+				if os.path.normcase(path) == manifestPath:
+					continue
+
+				relPath = os.path.relpath(path, directory)
+				try:
+					stat = os.stat(path)
+					old = previous.get(relPath)
+					if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+						entry = old
+					else:
+						entry = (stat.st_size, stat.st_mtime_ns, BuildManifest.hashFile(path))
+				except OSError:
+					continue		# NOTE - Vanished or locked mid-scan
+
+				if stopAtFirstChange and (old is None or old[2] != entry[2]):
+					return None
+
+				files[relPath] = entry
+				if len(files) > BUILD_MANIFEST_MAX_FILES:
+					return None
+
+		if stopAtFirstChange and len(files) != len(previous):
+			return None		# NOTE - Something was deleted
+
+		return files
+
+	@staticmethod
+	def invalidate(scriptFile):
+		try:
+			os.remove(BuildManifest.path(scriptFile))
+		except OSError:
+			pass
+
+	@staticmethod
+	def record(scriptFile, command_name, previous):
+		files = BuildManifest.scan(scriptFile, previous, stopAtFirstChange=False)
+		if files is None:
+			return
+
+		path = BuildManifest.path(scriptFile)
+		try:
+			with open(path + ".tmp", "wb") as file:
+				pickle.dump((BUILD_MANIFEST_VERSION, command_name, files), file, pickle.HIGHEST_PROTOCOL)
+
+			os.replace(path + ".tmp", path)
+		except OSError as e:
+			trace(LOG_BUILD, "failed to write {}: {}", path, e)
+
+def killProcessTree(process):
+	# NOTE - Build scripts usually spawn compilers, and killing just powershell.exe/python.exe leaves them running
+	if sys.platform == "win32":
+		subprocess.run(
+			["taskkill", "/T", "/F", "/PID", str(process.pid)],
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.DEVNULL,
+			creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+	else:
+		process.kill()
+
+class BuildJob():
+
+	def __init__(self, command_name, scriptFile, isBuild, note=None, skipIfUpToDate=False):
+		self.command_name = command_name
+		self.scriptFile = scriptFile
+		self.isBuild = isBuild			# NOTE - Run jobs wait for (and require) a successful build that's already in flight
+		self.note = note				# NOTE - Extra line shown above the output, e.g. which files got saved for it
+		self.skipIfUpToDate = skipIfUpToDate
+		self.isUpToDate = False
+		self.isInputSavedDuringBuild = False	# NOTE - Then the files we see afterwards aren't what was built, so no manifest
+		self.launchTimeNs = None
+		self.isWarm = False
+		self.outputSize = 0
+		self.regressionNote = None		# NOTE - Set if this run was a lot slower than its recent history
+		self.scheduler = None
+		self.errors = None
+		self.process = None
+		self.lock = threading.Lock()
+		self.pending = []				# NOTE - Output lines waiting for the next flush into the panel
+		self.droppedCt = 0
+		self.exitCode = None
+		self.isCancelled = False
+		self.isFinished = False
+		self.startTime = 0
+		self.elapsed = 0
+		self.panel = None
+
+	def succeeded(self):
+		return self.isFinished and self.exitCode == 0 and not self.isCancelled
+
+	def start(self, scheduler, panel):
+		self.scheduler = scheduler
+		self.panel = panel
+		self.errors = scheduler.errors
+		header = f"{self.command_name} {self.scriptFile}\n\n"
+		if self.note:
+			header = f"{self.note}\n{header}"
+
+		self.panel.run_command("append", { "characters": header, "force": True, "scroll_to_end": True })
+
+		self.startTime = time.perf_counter()
+		threading.Thread(target=self.run, name=f"als build {self.scriptFile.name}", daemon=True).start()
+		sublime.set_timeout(self.flush, BUILD_FLUSH_MS)
+
+	def cancel(self):
+		with self.lock:
+			self.isCancelled = True
+			process = self.process
+
+		if process is not None and process.poll() is None:
+			killProcessTree(process)
+
+	def run(self):
+		# NOTE - Always finishes, even if our own bookkeeping (manifest, history...) raises, or flush() would wait forever
+		try:
+			manifest = None
+			if self.skipIfUpToDate:
+				manifest = BuildManifest.load(self.scriptFile, self.command_name)
+				if manifest is not None and BuildManifest.scan(self.scriptFile, manifest, stopAtFirstChange=True) is not None:
+					self.isUpToDate = True
+					self.exitCode = 0
+				else:
+					BuildManifest.invalidate(self.scriptFile)	# NOTE - If this build fails, its outputs can't be trusted either
+
+			if not self.isUpToDate:
+				self.launchTimeNs = time.time_ns()
+				self.runProcess()
+
+			self.elapsed = time.perf_counter() - self.startTime
+
+			if self.skipIfUpToDate and not self.isUpToDate and self.exitCode == 0 and not self.isCancelled:
+				if self.isInputSavedDuringBuild:
+					trace(LOG_BUILD, "not recording a manifest for {}, files under it were saved mid-build", self.scriptFile)
+				else:
+					BuildManifest.record(self.scriptFile, self.command_name, manifest)
+
+			self.regressionNote = BuildHistory.record(self)
+		except Exception:
+			self.elapsed = time.perf_counter() - self.startTime
+			if self.exitCode is None:
+				self.exitCode = -1
+
+			self.post(f"\nbuild job failed:\n{traceback.format_exc()}")
+		finally:
+			with self.lock:
+				self.isFinished = True
+
+	def runProcess(self):
+		if BUILD_WARM_WORKERS and not WarmWorker.isOptedOut(self.scriptFile):
+			worker = WarmWorker.acquire(self.command_name)
+			if worker is not None:
+				with self.lock:
+					self.process = worker.process		# NOTE - So cancel() kills the worker, which then gets replaced
+					isCancelled = self.isCancelled
+
+				if isCancelled:
+					worker.release()
+					self.exitCode = -1
+					return
+
+				exitCode = worker.run(self)
+				if exitCode is not None:
+					self.exitCode = exitCode
+					self.isWarm = True
+					return
+
+		self.runColdProcess()
+
+	def runColdProcess(self):
+		try:
+			process = subprocess.Popen(
+				[self.command_name, str(self.scriptFile)],
+				stdin=subprocess.DEVNULL,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.STDOUT,
+				text=True,
+				errors="replace",
+				bufsize=1,
+				creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))	# NOTE - Windows only. Stops a console flashing up
+
+			with self.lock:
+				self.process = process
+				isCancelled = self.isCancelled
+
+			if isCancelled:
+				killProcessTree(process)		# NOTE - Cancelled while we were still spawning it
+
+			for line in process.stdout:
+				self.post(line)
+
+			self.exitCode = process.wait()
+		except OSError as e:
+			self.post(f"failed to start {self.command_name}: {e}\n")
+			self.exitCode = -1
+
+	def post(self, line):
+		self.errors.parse(line, str(self.scriptFile.parent))		# NOTE - Before any dropping, so the error index is complete
+
+		with self.lock:
+			self.outputSize += len(line)
+			self.pending.append(line)
+			if len(self.pending) > BUILD_MAX_PENDING_LINES:
+				overflow = len(self.pending) - BUILD_MAX_PENDING_LINES
+				del self.pending[:overflow]
+				self.droppedCt += overflow
+
+	def flush(self):
+		with self.lock:
+			isFinished = self.isFinished
+			lines, self.pending = self.pending, []
+			droppedCt, self.droppedCt = self.droppedCt, 0
+
+		if droppedCt:
+			lines.insert(0, f"... {droppedCt} line(s) dropped, output was arriving faster than the panel could take it\n")
+
+		if isFinished:
+			if self.isCancelled:
+				lines.append(f"\n[Cancelled after {self.elapsed:.1f}s]\n")
+			elif self.isUpToDate:
+				lines.append(f"[Up to date, skipped (checked in {self.elapsed:.1f}s)]\n")
+			else:
+				lines.append(f"\n[Finished in {self.elapsed:.1f}s with exit code {self.exitCode}]\n")
+
+			if self.regressionNote:
+				lines.append(f"[Slower than usual: {self.regressionNote}]\n")
+
+		if lines:
+			self.panel.run_command("append", { "characters": "".join(lines), "force": True, "scroll_to_end": True })
+
+		newErrorPaths = self.errors.merge()
+		if newErrorPaths:
+			self.errors.draw(self.scheduler.window, newErrorPaths)
+
+		if isFinished:
+			trace(LOG_BUILD, "{} exited with {} after {:.1f}s", self.scriptFile, self.exitCode, self.elapsed)
+			self.scheduler.onFinished(self)
+		else:
+			sublime.set_timeout(self.flush, BUILD_FLUSH_MS)
+
+	def describe(self):
+		if self.isCancelled:	return f"{self.scriptFile.name} cancelled"
+		if self.isUpToDate:		return f"{self.scriptFile.name} up to date"
+		if self.regressionNote:	return f"{self.scriptFile.name} succeeded in {self.elapsed:.1f}s (slower than usual)"
+		if self.exitCode == 0:	return f"{self.scriptFile.name} succeeded in {self.elapsed:.1f}s"
+		return f"{self.scriptFile.name} failed ({self.exitCode}) in {self.elapsed:.1f}s"
 
-		if not directory.is_dir():	raise AssertionError("Can't find directory to run script")
+class BuildScheduler():
+	"""Per-window queue of build/run jobs. A new job for a script supersedes whatever was already running or queued for it"""
+
+	@staticmethod
+	def get(window):
+		return WindowEx.get(window).builds
+
+	@staticmethod
+	def onSaved(filename):
+		"""Flags running up-to-date checked builds whose directory the file is under, if it was saved after they launched"""
+		# NOTE - Called off the main thread. Saves made for a build (see saveDirtyViewsUnder) arrive here after it
+		#  started, which the mtime check sorts out
+		path = os.path.normcase(os.path.abspath(filename))
+		for windowEx in list(WindowEx.dictionary.values()):
+			for job in list(windowEx.builds.running):
+				if not job.skipIfUpToDate or job.launchTimeNs is None:
+					continue
+
+				if not path.startswith(os.path.join(os.path.normcase(os.path.abspath(job.scriptFile.parent)), "")):
+					continue
+
+				try:
+					if os.stat(filename).st_mtime_ns >= job.launchTimeNs:
+						job.isInputSavedDuringBuild = True
+				except OSError:
+					job.isInputSavedDuringBuild = True
+
+	def __init__(self, window):
+		self.window = window
+		self.running = []
+		self.queued = []				# NOTE - (job, build it waits on or None), in submission order
+		self.panel = None
+		self.statusToken = 0
+		self.errors = BuildErrorIndex()
+
+	def submit(self, job):
+		if not self.running and not self.queued:
+			self.panel = self.window.create_output_panel(BUILD_PANEL_NAME)		# NOTE - Fresh panel, but a run queued behind a build shares it
+			self.errors.clear(self.window)
+			self.errors = BuildErrorIndex()
+
+		self.window.run_command("show_panel", { "panel": f"output.{BUILD_PANEL_NAME}" })
+
+		for other in self.running:
+			if other.scriptFile == job.scriptFile and not other.isCancelled:
+				trace(LOG_BUILD, "superseding running {}", other.scriptFile)
+				other.cancel()
+
+		supersededQueued = [other for other, _ in self.queued if other.scriptFile == job.scriptFile]
+		self.queued = [(other, waitingOn) for other, waitingOn in self.queued if other.scriptFile != job.scriptFile]
+
+		if job.isBuild:
+			# NOTE - Runs that were waiting on an older build of this script wait on this one instead
+			self.queued = [
+				(other, job if waitingOn is not None and waitingOn.scriptFile == job.scriptFile else waitingOn)
+				for other, waitingOn in self.queued]
+			waitingOn = None
+		else:
+			pendingBuilds = [other for other in self.running if other.isBuild and not other.isCancelled]
+			pendingBuilds += [other for other, _ in self.queued if other.isBuild]
+			waitingOn = pendingBuilds[-1] if pendingBuilds else None
+
+		trace(LOG_BUILD, "queued {} (superseded {} queued)", job.scriptFile, len(supersededQueued))
+		self.queued.append((job, waitingOn))
+		self.startReadyJobs()
+
+	def startReadyJobs(self):
+		stillQueued = []
+		for job, waitingOn in self.queued:
+			isReady = \
+				waitingOn is None and \
+				len(self.running) < BUILD_MAX_RUNNING_JOBS and \
+				not any(other.scriptFile == job.scriptFile for other in self.running)	# NOTE - Superseded job still dying
+
+			if isReady:
+				self.running.append(job)
+				job.start(self, self.panel)
+			else:
+				stillQueued.append((job, waitingOn))
+
+		self.queued = stillQueued
+		self.updateStatus()
+
+	def onFinished(self, job):
+		self.running.remove(job)
+
+		stillQueued = []
+		for other, waitingOn in self.queued:
+			if waitingOn is not job:
+				stillQueued.append((other, waitingOn))
+			elif job.succeeded():
+				stillQueued.append((other, None))
+			else:
+				self.panel.run_command("append", { "characters": f"[Skipped {other.scriptFile.name}, {job.describe()}]\n", "force": True, "scroll_to_end": True })
+
+		self.queued = stillQueued
+		self.startReadyJobs()
+
+		if not self.running and not self.queued:
+			self.showLingeringStatus(job.describe())
+
+	def updateStatus(self):
+		if not self.running and not self.queued:
+			return
+
+		parts = [f"{job.scriptFile.name} {'cancelling' if job.isCancelled else 'running'}" for job in self.running]
+		parts += [f"{job.scriptFile.name} queued" for job, _ in self.queued]
+		self.statusToken += 1
+		WindowEx.get(self.window).showCustomStatus(", ".join(parts), BUILD_STATUS_KEY)
+
+	def showLingeringStatus(self, text):
+		self.statusToken += 1
+		token = self.statusToken
+		WindowEx.get(self.window).showCustomStatus(text, BUILD_STATUS_KEY)
+
+		def clear():
+			if token == self.statusToken:
+				WindowEx.get(self.window).clearCustomStatus(BUILD_STATUS_KEY)
+
+		sublime.set_timeout(clear, BUILD_STATUS_LINGER_MS)
+
+# --- Warm build workers
+#		Interpreter startup is a big chunk of a short build/run, so we keep one interpreter per script type alive and hand it
+#		scripts over stdin. Each request is a json line, and the worker answers with the script's output followed by a
+#		sentinel line carrying the exit code. A worker that dies mid-script is reported and replaced. Between scripts the
+#		python worker runs the script's atexit handlers and puts back the cwd, argv, sys.path and os.environ it changed.
+
+BUILD_WARM_WORKERS				= True
+BUILD_WARM_OPT_OUT_MARKER		= "als-cold-start"	# NOTE - Put this in a comment near the top of a script to always start it fresh
+BUILD_WARM_OPT_OUT_SCAN_LINES	= 10
+
+WARM_PYTHON_BOOTSTRAP = """
+import atexit, json, os, runpy, sys, traceback
+while True:
+	line = sys.stdin.readline()
+	if not line:
+		break
+	request = json.loads(line)
+	script = request["script"]
+	scriptDir = os.path.join(os.path.dirname(os.path.abspath(script)), "")
+	savedCwd, savedArgv, savedPath, savedStdin = os.getcwd(), sys.argv, list(sys.path), sys.stdin
+	savedEnv = dict(os.environ)
+	sys.argv = [script]
+	sys.path.insert(0, os.path.dirname(script))
+	sys.stdin = open(os.devnull)
+	code = 0
+	try:
+		runpy.run_path(script, run_name="__main__")
+	except SystemExit as e:
+		if e.code is None or isinstance(e.code, int):
+			code = e.code or 0
+		else:
+			print(e.code)
+			code = 1
+	except BaseException:
+		traceback.print_exc(file=sys.stdout)
+		code = 1
+	finally:
+		atexit._run_exitfuncs()		# NOTE - What the script registered would otherwise pile up and run when the worker exits
+		for name, module in list(sys.modules.items()):
+			moduleFile = getattr(module, "__file__", None)
+			if moduleFile and os.path.abspath(moduleFile).startswith(scriptDir):
+				del sys.modules[name]	# NOTE - The script's own helper modules get re-imported fresh next time
+		sys.stdin.close()
+		os.chdir(savedCwd)
+		os.environ.clear()
+		os.environ.update(savedEnv)
+		sys.argv, sys.path[:], sys.stdin = savedArgv, savedPath, savedStdin
+	sys.stdout.flush()
+	sys.stderr.flush()
+	sys.stdout.write(request["sentinel"] + " " + str(code) + "\\n")
+	sys.stdout.flush()
+"""
+
+WARM_POWERSHELL_BOOTSTRAP = """
+while ($true) {
+	$line = [Console]::In.ReadLine()
+	if ($null -eq $line) { break }
+	$request = $line | ConvertFrom-Json
+	$global:LASTEXITCODE = 0
+	$code = 0
+	Push-Location
+	try {
+		& $request.script *>&1 | ForEach-Object { [Console]::Out.WriteLine("$_"); [Console]::Out.Flush() }
+		if ($LASTEXITCODE) { $code = $LASTEXITCODE }
+	} catch {
+		[Console]::Out.WriteLine("$_")
+		$code = 1
+	} finally {
+		Pop-Location
+	}
+	[Console]::Out.WriteLine("$($request.sentinel) $code")
+	[Console]::Out.Flush()
+}
+"""
+
+class WarmWorker():
+	dictionary = {}				# NOTE - Command name -> worker. Shared by every window
+	lock = threading.Lock()
+
+	@staticmethod
+	def bootstrapArgs(command_name):
+		name = os.path.basename(command_name).lower()
+		if re.fullmatch(r"(python[\d.]*|py)(\.exe)?", name):
+			code = base64.b64encode(WARM_PYTHON_BOOTSTRAP.encode("utf-8")).decode("ascii")
+			return [command_name, "-u", "-c", f"import base64; exec(base64.b64decode('{code}'))"]
+
+		if re.fullmatch(r"(powershell|pwsh)(\.exe)?", name):
+			code = base64.b64encode(WARM_POWERSHELL_BOOTSTRAP.encode("utf-16-le")).decode("ascii")
+			return [command_name, "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand", code]
+
+		return None
+
+	@staticmethod
+	def isOptedOut(scriptFile):
+		try:
+			with open(scriptFile, encoding="utf-8", errors="replace") as file:
+				for _, line in zip(range(BUILD_WARM_OPT_OUT_SCAN_LINES), file):
+					if BUILD_WARM_OPT_OUT_MARKER in line:
+						return True
+		except OSError:
+			return True
+
+		return False
+
+	@staticmethod
+	def acquire(command_name):
+		"""Returns an idle worker marked busy, or None if this command can't be kept warm or its worker is busy"""
+		with WarmWorker.lock:
+			worker = WarmWorker.dictionary.get(command_name)
+			if worker is None:
+				args = WarmWorker.bootstrapArgs(command_name)
+				if args is None:
+					return None
+
+				worker = WarmWorker(command_name, args)
+				WarmWorker.dictionary[command_name] = worker
+
+			if worker.isBusy:
+				return None		# NOTE - e.g. build.py and run.py at once. The second one just starts cold
+
+			worker.isBusy = True
+
+		if not worker.ensureRunning():
+			worker.release()
+			return None
+
+		return worker
+
+	@staticmethod
+	def stopAll():
+		with WarmWorker.lock:
+			workers = list(WarmWorker.dictionary.values())
+			WarmWorker.dictionary.clear()
+
+		for worker in workers:
+			worker.stop()
+
+	def __init__(self, command_name, args):
+		self.command_name = command_name
+		self.args = args
+		self.process = None
+		self.isBusy = False
+
+	def ensureRunning(self):
+		if self.process is not None and self.process.poll() is None:
+			return True
+
+		try:
+			self.process = subprocess.Popen(
+				self.args,
+				stdin=subprocess.PIPE,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.STDOUT,
+				text=True,
+				errors="replace",
+				bufsize=1,
+				creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+		except OSError as e:
+			trace(LOG_BUILD, "failed to start warm {} worker: {}", self.command_name, e)
+			self.process = None
+			return False
+
+		trace(LOG_BUILD, "started warm {} worker (pid {})", self.command_name, self.process.pid)
+		return True
+
+	def release(self):
+		with WarmWorker.lock:
+			self.isBusy = False
+
+	def stop(self):
+		process, self.process = self.process, None
+		if process is not None and process.poll() is None:
+			try:
+				process.stdin.close()		# NOTE - Bootstraps exit on EOF
+				process.wait(timeout=1)
+			except (OSError, subprocess.TimeoutExpired):
+				process.kill()
+
+	def restartInBackground(self):
+		def restart():
+			self.ensureRunning()
+			self.release()
+
+		threading.Thread(target=restart, name=f"als warm {self.command_name}", daemon=True).start()
+
+	def run(self, job):
+		"""Runs job's script in this worker, posting output to the job. Returns the exit code, or None if the request
+		couldn't even be sent (so the caller can fall back to a cold start)"""
+		process = self.process
+		sentinel = f"\x1eals-done-{os.urandom(8).hex()}"
+		try:
+			process.stdin.write(json.dumps({ "script": str(job.scriptFile), "sentinel": sentinel }) + "\n")
+			process.stdin.flush()
+		except OSError:
+			self.process = None
+			self.release()
+			return None
+
+		for line in process.stdout:
+			iSentinel = line.find(sentinel)
+			if iSentinel < 0:
+				job.post(line)
+				continue
+
+			if iSentinel > 0:
+				job.post(line[:iSentinel] + "\n")		# NOTE - Script output didn't end with a newline
+
+			try:
+				exitCode = int(line[iSentinel + len(sentinel):])
+			except ValueError:
+				exitCode = -1
+
+			self.release()
+			return exitCode
+
+		# NOTE - EOF before the sentinel: the worker crashed, the script called os._exit, or the job was cancelled
+		exitCode = process.wait()
+		self.process = None
+		if not job.isCancelled:
+			job.post(f"[warm {self.command_name} worker exited with {exitCode}, restarting it]\n")
+
+		self.restartInBackground()		# NOTE - Releases once the replacement is up
+		return -1 if exitCode is None else exitCode
+
+
+# --- Build error index
+#		Build output is matched line by line on the job's reader thread as it streams in, so the UI thread never scans it.
+#		Errors are kept in output order for next/prev, plus a copy sorted by (path, row, col) that lets us bisect from
+#		wherever the cursor is.
+
+BUILD_ERROR_PATTERNS = [
+	# NOTE - Named groups: file, line, optional col, optional message. A "warning" in the message draws it as a warning
+	("msvc",	r"^\s*(?P<file>[^\s(].*?)\((?P<line>\d+)(?:,(?P<col>\d+))?\)\s*:\s*(?P<message>(?:fatal )?(?:error|warning)\b.*)$"),
+	("gcc",		r"^(?P<file>(?:[A-Za-z]:)?[^:\s][^:]*):(?P<line>\d+):(?:(?P<col>\d+):)?\s*(?P<message>(?:fatal )?(?:error|warning):.*)$"),
+	("python",	r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<message>.*))?$'),
+]
+
+BUILD_ERROR_REGION_NAME		= "als_build_errors"
+BUILD_WARNING_REGION_NAME	= "als_build_warnings"
+
+class BuildErrorIndex():
+
+	patterns = [(name, re.compile(pattern)) for name, pattern in BUILD_ERROR_PATTERNS]
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.pending = []			# NOTE - Parsed off the main thread, merged in by merge()
+		self.seen = set()
+		self.entries = []			# NOTE - (normcased path, row, col, isWarning, message, path), in output order
+		self.sorted = []			# NOTE - (normcased path, row, col, index into entries), for bisecting
+		self.keys = []				# NOTE - (normcased path, row, col) of each sorted entry
+		self.iCurrent = -1			# NOTE - Into entries
+		self.drawnPaths = set()
+		self.lastJumpViewId = None
+
+	# --- Parsing (reader thread)
+
+	def parse(self, line, baseDirectory):
+		if ":" not in line and "(" not in line and "File" not in line:
+			return		# NOTE - Cheap reject for the bulk of build output
+
+		for name, pattern in BuildErrorIndex.patterns:
+			match = pattern.match(line.rstrip("\r\n"))
+			if match is None:
+				continue
+
+			file = match.group("file").strip()
+			path = os.path.normpath(os.path.join(baseDirectory, file))
+			if name == "python":
+				# NOTE - Tracebacks run through runpy, the warm worker's bootstrap and the standard library before they get
+				#  to the script. Only frames in the script's own tree are worth jumping to
+				if file.startswith("<") or not os.path.normcase(path).startswith(os.path.join(os.path.normcase(baseDirectory), "")):
+					return
+
+			row = int(match.group("line"))
+			col = int(match.group("col") or 1) if "col" in pattern.groupindex else 1
+			message = (match.group("message") or "").strip()
+			entry = (os.path.normcase(path), row, col, "warning" in message.lower(), message, path)
+
+			with self.lock:
+				if entry not in self.seen:
+					self.seen.add(entry)
+					self.pending.append(entry)
+
+			return
+
+	# --- Main thread
+
+	def merge(self):
+		"""Folds newly parsed errors into the index. Returns the set of (normcased) paths that got new errors"""
+		with self.lock:
+			pending, self.pending = self.pending, []
+
+		if not pending:
+			return set()
+
+		for entry in pending:
+			self.sorted.append(entry[:3] + (len(self.entries),))
+			self.entries.append(entry)
+
+		self.sorted.sort()			# NOTE - Timsort merges the new run in, so this stays cheap as errors trickle in
+		self.keys = [entry[:3] for entry in self.sorted]
+		return { entry[0] for entry in pending }
+
+	def draw(self, window, paths):
+		for view in window.views():
+			fileName = view.file_name()
+			if fileName and os.path.normcase(fileName) in paths:
+				self.drawView(view)
+
+	def drawView(self, view):
+		path = os.path.normcase(view.file_name() or "")
+		iBegin = bisect.bisect_left(self.keys, (path,))
+		iEnd = bisect.bisect_left(self.keys, (path + "\0",))
+		if iBegin == iEnd:
+			return
+
+		errors, warnings = [], []
+		for _, row, _, iEntry in self.sorted[iBegin:iEnd]:
+			region = view.line(view.text_point(row - 1, 0))
+			(warnings if self.entries[iEntry][3] else errors).append(region)
+
+		flags = sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SQUIGGLY_UNDERLINE
+		view.add_regions(BUILD_ERROR_REGION_NAME, errors, "region.redish", "circle", flags)
+		view.add_regions(BUILD_WARNING_REGION_NAME, warnings, "region.yellowish", "dot", flags)
+		self.drawnPaths.add(path)
+
+	def clear(self, window):
+		for view in window.views():
+			if os.path.normcase(view.file_name() or "") in self.drawnPaths:
+				view.erase_regions(BUILD_ERROR_REGION_NAME)
+				view.erase_regions(BUILD_WARNING_REGION_NAME)
+
+	def step(self, view, forward):
+		"""Index (into entries) of the error after (or before) the cursor if the active file has errors, otherwise the one
+		after (or before) the last error we jumped to, in output order. Wraps around"""
+		self.merge()
+		if not self.entries:
+			return -1
+
+		fileName = view.file_name() if view else None
+		path = os.path.normcase(fileName) if fileName else None
+		isAtLastJump = view is not None and view.id() == self.lastJumpViewId and 0 <= self.iCurrent < len(self.entries)
+		hasErrors = path is not None and bisect.bisect_left(self.keys, (path,)) != bisect.bisect_left(self.keys, (path + "\0",))
+
+		if hasErrors and not isAtLastJump and len(view.sel()) > 0:
+			row, col = view.rowcol(view.sel()[0].b)
+			key = (path, row + 1, col + 1)
+			if forward:		i = bisect.bisect_right(self.keys, key)
+			else:			i = bisect.bisect_left(self.keys, key) - 1
+			return self.sorted[i % len(self.sorted)][3]
+
+		if self.iCurrent < 0:
+			return 0 if forward else len(self.entries) - 1
+
+		return (self.iCurrent + (1 if forward else -1)) % len(self.entries)
+
+class AlsGotoBuildError(sublime_plugin.WindowCommand):
+	@instrumented
+	def run(self, forward=True):
+		errors = BuildScheduler.get(self.window).errors
+		i = errors.step(self.window.active_view(), forward)
+		if i < 0:
+			sublime.status_message("no build errors")
+			return
+
+		errors.iCurrent = i
+		_, row, col, _, message, path = errors.entries[i]
+
+		activeView = self.window.active_view()
+		if activeView is None or activeView.id() != errors.lastJumpViewId:
+			self.window.run_command("als_other_view")		# NOTE - Keep the code we were in visible. Later jumps stay put
+
+		view = self.window.open_file(f"{path}:{row}:{col}", sublime.ENCODED_POSITION)
+		if view is not None:
+			errors.lastJumpViewId = view.id()
+
+		WindowEx.get(self.window).showCustomStatus(f"Error {i + 1} of {len(errors.entries)}: {message}", BUILD_STATUS_KEY)
+
+
+# --- Build timing history
+#		One tab separated line per build/run, appended to a file in sublime's cache dir. Only successful runs that actually
+#		ran (not skipped as up to date) count towards the baseline, and warm and cold starts are compared separately.
+
+BUILD_HISTORY_PANEL_NAME			= "als_build_history"
+BUILD_HISTORY_MAX_BYTES				= 1024 * 1024		# NOTE - Past this the file is rewritten with its newer half
+BUILD_HISTORY_WINDOW				= 50				# NOTE - Runs per script the report's p50/p95 cover
+BUILD_HISTORY_BASELINE_RUNS			= 20
+BUILD_HISTORY_BASELINE_MIN_RUNS		= 5					# NOTE - Fewer than this and we don't flag anything yet
+BUILD_HISTORY_REGRESSION_PERCENT	= 25
+
+class BuildHistory():
+	lock = threading.Lock()
+	runs = None				# NOTE - (script path, is warm) -> deque of recent successful durations. Loaded on first use
+	counts = {}				# NOTE - Script path -> (invocations, failures) since the history began
+
+	@staticmethod
+	def path():
+		return os.path.join(sublime.cache_path(), "AlsEmacs", "build_history.tsv")
+
+	@staticmethod
+	def outcome(job):
+		if job.isCancelled:		return "cancelled"
+		if job.isUpToDate:		return "uptodate"
+		if job.exitCode == 0:	return "ok"
+		return "failed"
+
+	@staticmethod
+	def load():
+		BuildHistory.runs = {}
+		BuildHistory.counts = {}
+		try:
+			with open(BuildHistory.path(), encoding="utf-8") as file:
+				for line in file:
+					BuildHistory.add(line.rstrip("\n").split("\t"))
+		except (OSError, ValueError):
+			pass
+
+	@staticmethod
+	def add(fields):
+		if len(fields) != 7:
+			return		# NOTE - Torn write or old format
+
+		_, scriptPath, duration, exitCode, outputSize, outcome, mode = fields
+		invocations, failures = BuildHistory.counts.get(scriptPath, (0, 0))
+		BuildHistory.counts[scriptPath] = (invocations + 1, failures + (outcome == "failed"))
+
+		if outcome == "ok":
+			key = (scriptPath, mode == "warm")
+			runs = BuildHistory.runs.get(key)
+			if runs is None:
+				runs = BuildHistory.runs[key] = deque(maxlen=max(BUILD_HISTORY_WINDOW, BUILD_HISTORY_BASELINE_RUNS))
+
+			runs.append(float(duration))
+
+	@staticmethod
+	def percentile(values, p):
+		ordered = sorted(values)
+		return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+	@staticmethod
+	def record(job):
+		"""Appends the job to the history. Returns a note if it was a lot slower than its baseline, otherwise None"""
+		scriptPath = str(job.scriptFile)
+		mode = "warm" if job.isWarm else "cold"
+		fields = [
+			f"{time.time():.0f}", scriptPath, f"{job.elapsed:.3f}", str(job.exitCode), str(job.outputSize),
+			BuildHistory.outcome(job), mode]
+
+		note = None
+		with BuildHistory.lock:
+			if BuildHistory.runs is None:
+				BuildHistory.load()
+
+			baseline = list(BuildHistory.runs.get((scriptPath, job.isWarm), ()))[-BUILD_HISTORY_BASELINE_RUNS:]
+			if fields[5] == "ok" and len(baseline) >= BUILD_HISTORY_BASELINE_MIN_RUNS:
+				median = BuildHistory.percentile(baseline, 50)
+				if job.elapsed > median * (1 + BUILD_HISTORY_REGRESSION_PERCENT / 100):
+					note = f"{job.elapsed:.1f}s is {(job.elapsed / median - 1) * 100:.0f}% slower than the {median:.1f}s median of the last {len(baseline)} {mode} runs"
+
+			BuildHistory.add(fields)
+
+			try:
+				path = BuildHistory.path()
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+				with open(path, "a", encoding="utf-8") as file:
+					file.write("\t".join(fields) + "\n")
+
+				if os.path.getsize(path) > BUILD_HISTORY_MAX_BYTES:
+					BuildHistory.compact(path)
+			except OSError as e:
+				trace(LOG_BUILD, "failed to write build history: {}", e)
+
+		return note
+
+	@staticmethod
+	def compact(path):
+		with open(path, encoding="utf-8") as file:
+			lines = file.readlines()
+
+		with open(path + ".tmp", "w", encoding="utf-8") as file:
+			file.writelines(lines[len(lines) // 2:])
+
+		os.replace(path + ".tmp", path)
+
+	@staticmethod
+	def report():
+		with BuildHistory.lock:
+			if BuildHistory.runs is None:
+				BuildHistory.load()
+
+			runs = { key: list(durations) for key, durations in BuildHistory.runs.items() }
+			counts = dict(BuildHistory.counts)
+
+		lines = [f"Build/run timings over the last {BUILD_HISTORY_WINDOW} successful runs (! = latest run over {BUILD_HISTORY_REGRESSION_PERCENT}% slower than the ones before it)\n\n"]
+		lines.append(f"  {'script':<60}{'mode':>6}{'runs':>7}{'failed':>8}{'p50':>9}{'p95':>9}{'last':>9}\n")
+		for (scriptPath, isWarm), durations in sorted(runs.items()):
+			durations = durations[-BUILD_HISTORY_WINDOW:]
+			invocations, failures = counts.get(scriptPath, (0, 0))
+
+			baseline = durations[:-1][-BUILD_HISTORY_BASELINE_RUNS:]
+			isRegressed = \
+				len(baseline) >= BUILD_HISTORY_BASELINE_MIN_RUNS and \
+				durations[-1] > BuildHistory.percentile(baseline, 50) * (1 + BUILD_HISTORY_REGRESSION_PERCENT / 100)
+
+			lines.append(
+				f"{'!' if isRegressed else ' '} {scriptPath:<60}{'warm' if isWarm else 'cold':>6}{invocations:>7}{failures:>8}"
+				f"{BuildHistory.percentile(durations, 50):>8.1f}s{BuildHistory.percentile(durations, 95):>8.1f}s{durations[-1]:>8.1f}s\n")
+
+		if not runs:
+			lines.append("  (no successful runs recorded yet)\n")
+
+		return "".join(lines)
+
+class AlsShowBuildHistory(sublime_plugin.WindowCommand):
+	@instrumented
+	def run(self):
+		panel = self.window.create_output_panel(BUILD_HISTORY_PANEL_NAME)
+		panel.run_command("append", { "characters": BuildHistory.report() })
+		self.window.run_command("show_panel", { "panel": f"output.{BUILD_HISTORY_PANEL_NAME}" })
+
+
+# --- Build script discovery
+#		Every directory we've looked in remembers whether it has the script, so sibling directories only need to check
+#		themselves before hitting their parent's cached answer. Entries are revalidated against the directory's mtime, which
+#		changes whenever a file is added, removed or renamed in it.
+
+SCRIPT_DISCOVERY_MAX_ENTRIES	= 1024		# NOTE - Least recently used entries are dropped past this
+
+class ScriptDiscovery():
+
+	class Entry:
+		__slots__ = ("mtime", "scriptFile")
+
+		def __init__(self, mtime, scriptFile):
+			self.mtime = mtime
+			self.scriptFile = scriptFile		# NOTE - None if this directory doesn't have the script
+
+	cache = OrderedDict()	# NOTE - (directory, script name) -> Entry, least recently used first. Only touched on the main thread
+	scriptNames = set()
+
+	@staticmethod
+	def directoryMtime(directory):
+		try:
+			return os.stat(directory).st_mtime_ns
+		except OSError:
+			return None
+
+	@staticmethod
+	def find(directory, script_name):
+		ScriptDiscovery.scriptNames.add(script_name)
 
-		scriptFile = None
 		while True:
-			scriptFile = directory / (f"{script_name}")
-			if scriptFile.exists():
-				break
+			key = (directory, script_name)
+			entry = ScriptDiscovery.cache.get(key)
+			if entry is not None and ScriptDiscovery.directoryMtime(directory) != entry.mtime:
+				entry = None
+
+			if entry is None:
+				mtime = ScriptDiscovery.directoryMtime(directory)	# NOTE - Before checking for the file, so a racing create looks stale later
+				scriptFile = os.path.join(directory, script_name)
+				entry = ScriptDiscovery.Entry(mtime, scriptFile if os.path.isfile(scriptFile) else None)
+				ScriptDiscovery.cache[key] = entry
+				if len(ScriptDiscovery.cache) > SCRIPT_DISCOVERY_MAX_ENTRIES:
+					ScriptDiscovery.cache.popitem(last=False)
+			else:
+				ScriptDiscovery.cache.move_to_end(key)
 
-			# HMM - Is this really the only/best way to check if we are at the root directory...? Sigh...
-			parent = directory.parent
-			if directory.samefile(parent):
-				break
+			if entry.scriptFile:
+				return Path(entry.scriptFile)
+
+			parent = os.path.dirname(directory)
+			if parent == directory:
+				return None		# NOTE - Hit the root
 
 			directory = parent
 
-		if scriptFile and scriptFile.exists():
-			trace(LOG_BUILD, f"Running {str(scriptFile)}")
-			out = subprocess.run([command_name, str(scriptFile)], capture_output=True, text=True).stdout
-			print(out)
+	@staticmethod
+	def onSaved(filename):
+		# NOTE - The directory mtime catches the script being created, unless that landed in the same mtime tick as our
+		#  last look. Saving it is a good hint that might have happened
+		if os.path.basename(filename) in ScriptDiscovery.scriptNames:
+			sublime.set_timeout(ScriptDiscovery.cache.clear, 0)
+
+def saveDirtyViewsUnder(directory):
+	"""Saves every dirty view (in any window) whose file is under directory. Returns the paths saved"""
+	root = os.path.join(os.path.normcase(os.path.abspath(directory)), "")		# NOTE - Trailing separator, so /foo doesn't match /foobar
+
+	# NOTE - Collect first, then save, so each buffer is written once even when sync_views has it open in both groups
+	toSave = {}
+	for window in sublime.windows():
+		for view in window.views():
+			fileName = view.file_name()
+			if not fileName or not view.is_dirty() or view.buffer_id() in toSave:
+				continue
+
+			if os.path.normcase(os.path.abspath(fileName)).startswith(root):
+				toSave[view.buffer_id()] = view
+
+	saved = []
+	for view in toSave.values():
+		view.run_command("save")
+		saved.append(view.file_name())
+
+	return saved
+
+def findAndRunScript_inCurrentDirectory_orParent(activeView, command_name, script_name, isBuild, wantSave=False, skipIfUpToDate=False):
+	fileName = activeView.file_name()
+	if fileName:
+		directory = os.path.dirname(fileName)
+		scriptFile = ScriptDiscovery.find(directory, script_name)
+
+		if scriptFile:
+			note = None
+			if wantSave:
+				saved = saveDirtyViewsUnder(scriptFile.parent)
+				if saved:
+					names = ", ".join(os.path.relpath(path, scriptFile.parent) for path in saved)
+					note = f"Saved {len(saved)} file(s): {names}"
+					trace(LOG_BUILD, "{}", note)
+
+			trace(LOG_BUILD, "Running {}", scriptFile)
+			BuildScheduler.get(activeView.window()).submit(BuildJob(command_name, scriptFile, isBuild, note, skipIfUpToDate))
 		else:
-			trace(LOG_BUILD, f"ERROR: No {str(scriptFile)} found")
+			trace(LOG_BUILD, "ERROR: No {} found above {}", script_name, directory)
+			sublime.status_message(f"No {script_name} found in {directory} or above")
 
 # def findAndRunPython_inCurrentOrParentDirectory(activeView, script_name):
 # 	fileName = activeView.file_name()
@@ -636,41 +2008,50 @@ def findAndRunScript_inCurrentDirectory_orParent(activeView, command_name, scrip
 
 
 class AlsBuildPy(sublime_plugin.WindowCommand):
-	def run(self):
-		print("\n" * 25)		# HACK
-		self.window.run_command("save_all")		# HMM - Should we reduce this to only saving the files below the directory of the build script?
+	@instrumented
+	def run(self, skip_if_up_to_date=False):
 		findAndRunScript_inCurrentDirectory_orParent(
 			self.window.active_view(),
 			"python.exe",
-			"build.py")
+			"build.py",
+			isBuild=True,
+			wantSave=True,
+			skipIfUpToDate=skip_if_up_to_date)
 
 class AlsRunPy(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
 		findAndRunScript_inCurrentDirectory_orParent(
 			self.window.active_view(),
 			"python.exe",
-			"run.py")
+			"run.py",
+			isBuild=False)
 
 class AlsBuildPowershell(sublime_plugin.WindowCommand):
-	def run(self):
+	@instrumented
+	def run(self, skip_if_up_to_date=False):
 		self.window.run_command("hide_panel")
-		self.window.run_command("save_all")		# HMM - Should we reduce this to only saving the files below the directory of the build script?
 		findAndRunScript_inCurrentDirectory_orParent(
 			self.window.active_view(),
 			"powershell.exe",
-			"build.ps1")
+			"build.ps1",
+			isBuild=True,
+			wantSave=True,
+			skipIfUpToDate=skip_if_up_to_date)
 
 class AlsRunPowershell(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
-		print("\n" * 25)		# HACK
-		self.window.run_command("save_all")		# HMM - Should we reduce this to only saving the files below the directory of the build script?
 		findAndRunScript_inCurrentDirectory_orParent(
 			self.window.active_view(),
 			"powershell.exe",
-			"run.ps1")
+			"run.ps1",
+			isBuild=False,
+			wantSave=True)
 
 class AlsHidePanelThenRun(sublime_plugin.WindowCommand):
 	"""Auto-close a panel and jump right back into the normal view with a command"""
+	@instrumented
 	def run(self, **kwargs):
 
 		# TODO - extend this command to run on panels that aren't i-search?
@@ -681,7 +2062,7 @@ class AlsHidePanelThenRun(sublime_plugin.WindowCommand):
 		command_name = kwargs["command_name"]
 		command_args = kwargs["command_args"]
 
-		trace(LOG_HIDE_PANEL_THEN_RUN, str(command_args))
+		trace(LOG_HIDE_PANEL_THEN_RUN, "{}", command_args)
 
 		self.window.run_command("hide_panel")
 
@@ -693,25 +2074,323 @@ class AlsHidePanelThenRun(sublime_plugin.WindowCommand):
 		# NOTE - As of Sublime Text 4.0, calling run_command won't give your hooks a chance to intercept/modify it,
 		#  which breaks the transient mark. So we manually call the hook before dispatching :)
 
-		modified = None
-		if AlsEventListener.instance:
+		command_name, command_args = CommandRewriter.rewrite(view, markSel, command_name, command_args)
+		trace(LOG_HIDE_PANEL_THEN_RUN, "running {}", command_name)
+		view.run_command(command_name, command_args)
+
+# --- Command rewriting
+#		Feeds a command through on_text_command until it stops changing, the same way Sublime would have if we weren't
+#		dispatching it ourselves. Keybindings send the same few commands over and over, so when every handler involved is
+#		pure the final command is remembered and the next press is a dict lookup.
+
+COMMAND_REWRITE_MAX_DEPTH		= 8
+COMMAND_REWRITE_CACHE_SIZE		= 256
+
+class CommandRewriter():
+	cache = {}		# NOTE - (command name, frozen args, is mark active) -> final (command name, args)
+
+	@staticmethod
+	def freeze(value):
+		if isinstance(value, dict):
+			return tuple(sorted((k, CommandRewriter.freeze(v)) for k, v in value.items()))
+		if isinstance(value, list):
+			return tuple(CommandRewriter.freeze(v) for v in value)
+
+		return value
+
+	@staticmethod
+	def isPure(command_name):
+		handlers = TEXT_COMMAND_HANDLERS.get(command_name, ())
+		return all(handler in TEXT_COMMAND_PURE_HANDLERS for handler in handlers)
+
+	@staticmethod
+	def rewrite(view, markSel, command_name, command_args):
+		if not AlsEventListener.instance:
 			# HMM - It might be possible for this to run before AlsEventListener.__init__(..), but it seems very unlikely?
 			#  This is just a safeguard, but the behavior might still be broken if that happens and something was depending on
 			#  the on_text_command hook running
-			modified = AlsEventListener.instance.on_text_command(view, command_name, command_args)
+			return (command_name, command_args)
+
+		key = None
+		if view.element() is None:		# NOTE - Handlers behave differently in panels, and the key doesn't capture that
+			try:
+				key = (command_name, CommandRewriter.freeze(command_args), markSel.isMarkActive())
+				hash(key)
+			except TypeError:
+				key = None
+
+		if key is not None:
+			cached = CommandRewriter.cache.get(key)
+			if cached is not None:
+				trace(LOG_HIDE_PANEL_THEN_RUN, "rewrite cache hit for {}", command_name)
+				return (cached[0], copy.deepcopy(cached[1]))		# NOTE - Handlers mutate args in place
+
+		isPure = True
+		seen = { key[:2] } if key is not None else set()
+		current = (command_name, command_args)
+		for depth in range(COMMAND_REWRITE_MAX_DEPTH):
+			isPure = isPure and CommandRewriter.isPure(current[0])
+
+			modified = AlsEventListener.instance.on_text_command(view, current[0], current[1])
+			if modified is None:
+				break
 
-		if modified is None:
-			trace(LOG_HIDE_PANEL_THEN_RUN, f"running {command_name} unmodified")
-			view.run_command(command_name, command_args)
-		else:
-			lastModified = (command_name, command_args)
-			while modified is not None:
-				trace(LOG_HIDE_PANEL_THEN_RUN, f"modified {lastModified[0]} into {modified[0]}")
-				lastModified = modified
-				modified = AlsEventListener.instance.on_text_command(view, modified[0], modified[1])
+			trace(LOG_HIDE_PANEL_THEN_RUN, "modified {} into {}", current[0], modified[0])
 
-			trace(LOG_HIDE_PANEL_THEN_RUN, f"running {lastModified[0]} (modified)")
-			view.run_command(lastModified[0], lastModified[1])
+			try:
+				modifiedKey = (modified[0], CommandRewriter.freeze(modified[1]))
+				isCycle = modifiedKey in seen
+				seen.add(modifiedKey)
+			except TypeError:
+				isCycle = False
+
+			if isCycle:
+				print(f"als_hide_panel_then_run: {command_name} rewrites itself in a cycle, running {modified[0]} as is")
+				return modified
+
+			current = modified
+		else:
+			print(f"als_hide_panel_then_run: gave up rewriting {command_name} after {COMMAND_REWRITE_MAX_DEPTH} steps")
+			return current
+
+		if key is not None and isPure:
+			if len(CommandRewriter.cache) >= COMMAND_REWRITE_CACHE_SIZE:
+				CommandRewriter.cache.clear()
+
+			CommandRewriter.cache[key] = (current[0], copy.deepcopy(current[1]))
+
+		return current
+
+# --- I-Search match cache
+#		find_all(..) scans the whole buffer, so remember its results keyed on everything that can change them.
+#		Once a buffer's change_count(..) moves on, its old entries can never hit again, so they get dropped eagerly.
+
+ISEARCH_CACHE_MAX_ENTRIES	= 32
+ISEARCH_CACHE_MAX_REGIONS	= 1000000	# NOTE - Summed across all entries. A search with more matches than this still works, it just isn't cached
+
+class ISearchMatches():
+
+	def __init__(self, key, regions, error=None):
+		self.key = key				# (buffer id, change count, text, flags)
+		self.regions = regions		# NOTE - Sorted and non-overlapping, straight from find_all(..)
+		self.error = error			# NOTE - Set (with no regions) if a regex was invalid or ran out of time
+		self.starts = [region.a for region in regions]
+		self.ends = [region.b for region in regions]		# NOTE - Also sorted, since the matches don't overlap
+
+	def iFirstStartingAtOrAfter(self, pt):
+		return bisect.bisect_left(self.starts, pt)			# NOTE - len(..) if there is none
+
+	def iLastEndingAtOrBefore(self, pt):
+		return bisect.bisect_right(self.ends, pt) - 1		# NOTE - -1 if there is none
+
+class ISearchMatchCache():
+
+	entries = OrderedDict()			# NOTE - Ordered from least to most recently used
+	regionCt = 0
+
+	@staticmethod
+	def makeKey(view, text, flags):
+		return (view.buffer_id(), view.change_count(), text, int(flags & (sublime.LITERAL | sublime.IGNORECASE)))	# NOTE - No LITERAL means regex
+
+	@staticmethod
+	def get(key):
+		result = ISearchMatchCache.entries.get(key)
+		if result is not None:
+			ISearchMatchCache.entries.move_to_end(key)
+
+		return result
+
+	@staticmethod
+	def put(matches):
+		if len(matches.regions) > ISEARCH_CACHE_MAX_REGIONS:
+			return
+
+		bufferId, changeCount = matches.key[0], matches.key[1]
+		for key in [key for key in ISearchMatchCache.entries if key[0] == bufferId and key[1] != changeCount]:
+			ISearchMatchCache.evict(key)
+
+		if matches.key in ISearchMatchCache.entries:
+			ISearchMatchCache.evict(matches.key)
+
+		ISearchMatchCache.entries[matches.key] = matches
+		ISearchMatchCache.regionCt += len(matches.regions)
+
+		while len(ISearchMatchCache.entries) > ISEARCH_CACHE_MAX_ENTRIES or \
+			  ISearchMatchCache.regionCt > ISEARCH_CACHE_MAX_REGIONS:
+			ISearchMatchCache.evict(next(iter(ISearchMatchCache.entries)))
+
+	@staticmethod
+	def evict(key):
+		matches = ISearchMatchCache.entries.pop(key)
+		ISearchMatchCache.regionCt -= len(matches.regions)
+
+	@staticmethod
+	def lookup(view, text, flags, narrowFrom=None):
+		"""Matches we can come up with without scanning the whole buffer, or None"""
+		key = ISearchMatchCache.makeKey(view, text, flags)
+		result = ISearchMatchCache.get(key)
+
+		if result is None and narrowFrom is not None:
+			result = ISearchMatchCache.narrow(view, key, narrowFrom)
+			if result is not None:
+				ISearchMatchCache.put(result)
+
+		return result
+
+	@staticmethod
+	def findAll(view, text, flags, narrowFrom=None):
+		result = ISearchMatchCache.lookup(view, text, flags, narrowFrom=narrowFrom)
+		if result is None:
+			trace(LOG_ISEARCH, "match cache miss for {}", text)
+			result = ISearchMatches(ISearchMatchCache.makeKey(view, text, flags), view.find_all(text, flags=flags))
+			ISearchMatchCache.put(result)
+
+		return result
+
+	@staticmethod
+	def narrow(view, key, previous):
+		"""Every match of a longer query starts at a match of the shorter one, so just re-check those instead of the whole buffer"""
+		bufferId, changeCount, text, flags = key
+		prevBufferId, prevChangeCount, prevText, prevFlags = previous.key
+
+		if bufferId != prevBufferId or changeCount != prevChangeCount or flags != prevFlags:
+			return None
+
+		if not (flags & sublime.LITERAL) or not prevText or len(text) <= len(prevText):
+			return None
+
+		ignoreCase = bool(flags & sublime.IGNORECASE)
+		if ignoreCase:
+			text = text.lower()
+			prevText = prevText.lower()
+
+		if not text.startswith(prevText):
+			return None
+
+		# NOTE - find_all(..) doesn't report overlapping matches, so if prevText can overlap itself (e.g. "aa" in "aaab")
+		#  the previous list might be missing the only position the longer query matches at
+		if ISearchMatchCache.canOverlapItself(prevText):
+			return None
+
+		suffix = text[len(prevText):]
+		regions = []
+		if not previous.regions:
+			return ISearchMatches(key, regions)
+
+		# NOTE - One substr(..) covering every match, instead of an API round trip per match. A one letter query can have
+		#  a million of them
+		spanA = previous.regions[0].a
+		spanText = view.substr(sublime.Region(spanA, min(view.size(), previous.regions[-1].a + len(text))))
+
+		lastEnd = -1
+		for match in previous.regions:
+			if match.a < lastEnd:
+				continue	# NOTE - Mirror find_all(..) by not reporting overlapping matches
+
+			tail = spanText[match.a + len(prevText) - spanA:match.a + len(text) - spanA]
+			if ignoreCase:
+				tail = tail.lower()
+
+			if tail == suffix:
+				regions.append(sublime.Region(match.a, match.a + len(text)))
+				lastEnd = match.a + len(text)
+
+		trace(LOG_ISEARCH, "narrowed {} matches down to {}", len(previous.regions), len(regions))
+		return ISearchMatches(key, regions)
+
+	@staticmethod
+	def findAllInText(bufferText, text, flags):
+		"""find_all(..) for a LITERAL search over a snapshot of the buffer, so it can run off the UI thread"""
+		if flags & sublime.IGNORECASE:
+			bufferText = bufferText.lower()
+			text = text.lower()
+
+		regions = []
+		i = bufferText.find(text)
+		while i >= 0 and text:
+			regions.append(sublime.Region(i, i + len(text)))
+			i = bufferText.find(text, i + len(text))		# NOTE - Non-overlapping, like find_all(..)
+
+		return regions
+
+	@staticmethod
+	def canOverlapItself(text):
+		return any(text.startswith(text[i:]) for i in range(1, len(text)))
+
+	@staticmethod
+	def rematch(view, previous, changes):
+		"""Patches matches up after an edit by shifting the ones the edit didn't touch, and only rescanning around the
+		edited spans. Returns None if that isn't possible, in which case the next search just rescans everything"""
+		bufferId, changeCount, text, flags = previous.key
+		ignoreCase = bool(flags & sublime.IGNORECASE)
+
+		if previous.error:
+			return None
+
+		if not (flags & sublime.LITERAL):
+			return None		# NOTE - This runs on the UI thread, where a regex can't be stopped. The next search rescans through ISearchRegex.scan(..)
+
+		if ISearchMatchCache.canOverlapItself(text.lower() if ignoreCase else text):
+			return None		# NOTE - Rescanning a span could then disagree with find_all(..) about which overlapping match wins
+
+		# --- Shift/drop matches, one change at a time (each change is relative to the buffer after the previous one)
+
+		current = [(region.a, region.b) for region in previous.regions]
+		spans = []		# NOTE - Edited spans, in the coordinates of the buffer after the latest change so far
+		for change in changes:
+			a, b = change.a.pt, change.b.pt
+			delta = len(change.str) - (b - a)
+
+			kept = []
+			for matchA, matchB in current:
+				if matchA >= b:
+					kept.append((matchA + delta, matchB + delta))
+				elif matchB <= a:
+					kept.append((matchA, matchB))
+				# else - the edit touched this match, so drop it. If it still matches, the rescan will find it again
+
+			current = kept
+
+			shiftedSpans = []
+			for spanA, spanB in spans:
+				if spanA >= b:
+					shiftedSpans.append((spanA + delta, spanB + delta))
+				elif spanB <= a:
+					shiftedSpans.append((spanA, spanB))
+				else:
+					shiftedSpans.append((min(spanA, a), max(a + len(change.str), spanB + delta)))
+
+			shiftedSpans.append((a, a + len(change.str)))
+			spans = shiftedSpans
+
+		# --- Widen the spans to cover any match that could overlap the edit, then merge them
+
+		size = view.size()
+		widened = []
+		for spanA, spanB in sorted(spans):
+			spanA, spanB = max(0, spanA - len(text) + 1), min(size, spanB + len(text) - 1)
+
+			if widened and spanA <= widened[-1][1]:
+				widened[-1] = (widened[-1][0], max(widened[-1][1], spanB))
+			else:
+				widened.append((spanA, spanB))
+
+		if sum(spanB - spanA for spanA, spanB in widened) > size * ISEARCH_REMATCH_MAX_FRACTION:
+			return None		# NOTE - Not worth patching up, e.g. after a revert
+
+		# --- Rescan the spans
+
+		for spanA, spanB in widened:
+			current = [(matchA, matchB) for matchA, matchB in current if matchA < spanA or matchB > spanB]
+			spanText = view.substr(sublime.Region(spanA, spanB))
+
+			for region in ISearchMatchCache.findAllInText(spanText, text, flags):
+				current.append((spanA + region.a, spanA + region.b))
+
+		current.sort()
+		key = (bufferId, view.change_count(), text, flags)
+		trace(LOG_ISEARCH, "rematched {} matches into {}, rescanning {} span(s)", len(previous.regions), len(current), len(widened))
+		return ISearchMatches(key, [sublime.Region(matchA, matchB) for matchA, matchB in current])
 
 # --- I-Search
 #		https://www.gnu.org/software/emacs/manual/html_node/emacs/Repeat-Isearch.html
@@ -738,6 +2417,216 @@ class AlsHidePanelThenRun(sublime_plugin.WindowCommand):
 #			2021
 #				6/15: move_to now properly exits the input panel when running i-search
 
+# --- I-Search regex mode
+#		Sublime's find_all(..) can't be interrupted, and python's re holds the GIL for as long as a match takes, so a thread
+#		can't save us from catastrophic backtracking either. Regexes run in a separate interpreter instead, which gets
+#		killed if it runs past the time budget. Scans happen off the UI thread, and late results are thrown away.
+
+ISEARCH_REGEX_CACHE_SIZE		= 64
+ISEARCH_REGEX_TIME_BUDGET_MS	= 500
+ISEARCH_REGEX_CHUNK_SIZE		= 256 * 1024	# NOTE - Only used by the in-process fallback
+ISEARCH_REGEX_WORKER_COMMAND	= "python.exe"	# NOTE - None to always scan in-process (which can't stop mid-chunk)
+ISEARCH_REGEX_MAX_IDLE_WORKERS	= 4
+
+ISEARCH_REGEX_WORKER_BOOTSTRAP = """
+import array, json, re, sys
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+while True:
+	line = stdin.readline()
+	if not line:
+		break
+	request = json.loads(line)
+	text = stdin.read(request["size"]).decode("utf-8", "surrogatepass")
+	stdout.write(b"ready\\n")
+	stdout.flush()
+	spans = array.array("q")
+	try:
+		for match in re.compile(request["pattern"], request["flags"]).finditer(text):
+			if match.end() > match.start():
+				spans.extend(match.span())
+		reply = { "size": len(spans) * spans.itemsize }
+	except Exception as e:
+		spans = array.array("q")
+		reply = { "size": 0, "error": str(e) }
+	stdout.write(json.dumps(reply).encode("utf-8") + b"\\n")
+	stdout.write(spans.tobytes())
+	stdout.flush()
+"""
+
+class RegexWorker():
+	idle = []				# NOTE - Shared by every window. A busy worker is out of this list, so each scan gets its own
+	lock = threading.Lock()
+	isUnavailable = False	# NOTE - Set if a fresh worker dies before taking its first request, e.g. python.exe is the
+							#  Windows Store alias. Everything scans in-process from then on
+
+	@staticmethod
+	def acquire():
+		"""Returns an idle worker, starting one if need be. None if the interpreter can't be started"""
+		with RegexWorker.lock:
+			while RegexWorker.idle:
+				worker = RegexWorker.idle.pop()
+				if worker.process.poll() is None:
+					return worker		# NOTE - Otherwise it died while idle, so start a fresh one
+
+		if ISEARCH_REGEX_WORKER_COMMAND is None or RegexWorker.isUnavailable:
+			return None
+
+		code = base64.b64encode(ISEARCH_REGEX_WORKER_BOOTSTRAP.encode("utf-8")).decode("ascii")
+		try:
+			process = subprocess.Popen(
+				[ISEARCH_REGEX_WORKER_COMMAND, "-u", "-c", f"import base64; exec(base64.b64decode('{code}'))"],
+				stdin=subprocess.PIPE,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.DEVNULL,
+				creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+		except OSError as e:
+			trace(LOG_ISEARCH, "failed to start regex worker: {}", e)
+			return None
+
+		return RegexWorker(process)
+
+	@staticmethod
+	def stopAll():
+		with RegexWorker.lock:
+			workers, RegexWorker.idle = RegexWorker.idle, []
+
+		for worker in workers:
+			worker.process.kill()
+
+	def __init__(self, process):
+		self.process = process
+		self.isKilled = False
+		self.isFresh = True
+
+	def release(self):
+		with RegexWorker.lock:
+			if not self.isKilled and self.process.poll() is None and len(RegexWorker.idle) < ISEARCH_REGEX_MAX_IDLE_WORKERS:
+				RegexWorker.idle.append(self)
+				return
+
+		self.process.kill()
+
+	def kill(self):
+		self.isKilled = True
+		self.process.kill()
+
+	def scan(self, pattern, text):
+		"""Returns (spans, error), where spans is a flat array of begin/end offsets, or None if the worker died before it
+		got the text. Kills the worker if the match itself runs out of time"""
+		data = text.encode("utf-8", "surrogatepass")
+		try:
+			request = { "pattern": pattern.pattern, "flags": pattern.flags, "size": len(data) }
+			self.process.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+			self.process.stdin.write(data)
+			self.process.stdin.flush()
+			isReady = self.process.stdout.readline() == b"ready\n"
+		except OSError:
+			isReady = False
+
+		if not isReady:
+			if self.isFresh:
+				trace(LOG_ISEARCH, "regex worker exited before its first scan, scanning in-process from now on")
+				RegexWorker.isUnavailable = True
+
+			self.kill()
+			return None
+
+		self.isFresh = False
+
+		# NOTE - Only the match is on the clock. Shipping a big buffer across takes a while, but it can't hang
+		timer = threading.Timer(ISEARCH_REGEX_TIME_BUDGET_MS / 1000, self.kill)
+		timer.start()
+		try:
+			line = self.process.stdout.readline()
+		except OSError:
+			line = b""
+		finally:
+			timer.cancel()
+
+		if self.isKilled:
+			return [], f"Regex gave up after {ISEARCH_REGEX_TIME_BUDGET_MS}ms"
+
+		try:
+			reply = json.loads(line)
+			spans = array.array("q")
+			spans.frombytes(self.process.stdout.read(reply["size"]))
+		except (ValueError, KeyError, OSError):
+			return [], "Regex worker exited unexpectedly"
+
+		return spans, reply.get("error")
+
+class ISearchRegex():
+
+	patterns = OrderedDict()		# NOTE - (text, flags) -> (compiled pattern, error), least recently used first. LITERAL text gets escaped
+
+	@staticmethod
+	def compile(text, flags):
+		key = (text, flags)
+		result = ISearchRegex.patterns.get(key)
+		if result is not None:
+			ISearchRegex.patterns.move_to_end(key)
+			return result
+
+		reFlags = re.MULTILINE
+		if flags & sublime.IGNORECASE:
+			reFlags |= re.IGNORECASE
+
+		try:
+			result = (re.compile(re.escape(text) if flags & sublime.LITERAL else text, reFlags), None)
+		except (re.error, OverflowError, RecursionError) as e:
+			result = (None, f"Invalid regex: {getattr(e, 'msg', None) or e}")
+
+		ISearchRegex.patterns[key] = result
+		if len(ISearchRegex.patterns) > ISEARCH_REGEX_CACHE_SIZE:
+			ISearchRegex.patterns.popitem(last=False)
+
+		return result
+
+	@staticmethod
+	def scan(pattern, text):
+		"""Returns (regions, error). Blocks for up to the time budget, so call it off the UI thread"""
+		worker = RegexWorker.acquire()
+		if worker is not None:
+			result = worker.scan(pattern, text)
+			worker.release()
+			if result is not None:
+				spans, error = result
+				return [sublime.Region(spans[i], spans[i + 1]) for i in range(0, len(spans), 2)], error
+
+		return ISearchRegex.scanInProcess(pattern, text)
+
+	@staticmethod
+	def scanInProcess(pattern, text):
+		# NOTE - Only checks the deadline between chunks, so a pathological pattern can still run way past it. Matches that
+		#  span a chunk boundary are missed, but chunks are big and end on line breaks
+		deadline = time.perf_counter() + ISEARCH_REGEX_TIME_BUDGET_MS / 1000
+		regions = []
+		pos = 0
+		while pos < len(text):
+			chunkEnd = text.find("\n", pos + ISEARCH_REGEX_CHUNK_SIZE)
+			chunkEnd = len(text) if chunkEnd < 0 else chunkEnd + 1
+
+			for match in pattern.finditer(text, pos, chunkEnd):
+				if match.end() > match.start():		# NOTE - Skip empty matches, there's nothing to select
+					regions.append(sublime.Region(match.start(), match.end()))
+
+			if time.perf_counter() > deadline:
+				return [], f"Regex gave up after {ISEARCH_REGEX_TIME_BUDGET_MS}ms"
+
+			pos = chunkEnd
+
+		return regions, None
+
+ISEARCH_VIEWPORT_HIGHLIGHT_MIN_MATCHES	= 2000	# NOTE - With fewer matches than this we just outline all of them. None to always do that
+ISEARCH_VIEWPORT_MARGIN_SCREENS			= 1		# NOTE - How far past the visible region (in screen-fulls) to outline matches
+ISEARCH_VIEWPORT_MAX_DRAWN				= 20000	# NOTE - Outlines accumulate as you scroll, up to this many
+ISEARCH_VIEWPORT_POLL_MS				= 100
+ISEARCH_DEBOUNCE_MS						= 75	# NOTE - While typing, wait for this long a pause before counting/outlining matches. 0 to do it every keystroke
+ISEARCH_ASYNC_MIN_BUFFER_SIZE			= 8 * 1024 * 1024	# NOTE - Buffers at least this big (in characters) count their matches in the background
+ISEARCH_REVERSE_CHUNK_SIZE				= 64 * 1024
+ISEARCH_ALL_VIEWS_WORKERS				= 4
+ISEARCH_REMATCH_MAX_FRACTION			= 0.25	# NOTE - If an edit touches more of the buffer than this, just rescan everything next search
+
 class ISearch():
 
 	# --- Constants
@@ -760,14 +2649,23 @@ class ISearch():
 
 	NO_FOCUS = Focus(Focus.State.NIL, None)
 
+	allViewsPool = None			# NOTE - Shared by every window, created on first use
+
+	__slots__ = (
+		"window", "lastSavedSearch", "text", "forward", "regex", "allViews", "treatCancelLikeDone", "cursorOnOpen",
+		"inputView", "inputViewEx", "inputMarkSel", "focus", "matches", "iFocus", "drawnMatches", "drawnRanges",
+		"viewportPollMatches", "viewportPollToken", "collectGeneration")
+
 	@staticmethod
 	def get(window):
-		trace(LOG_ISEARCH, "getting i-search mgr for window " + str(window.id()))
+		trace(LOG_ISEARCH, "getting i-search mgr for window {}", window.id())
 		return WindowEx.get(window).iSearch
 
 	def __init__(self, window):
 		self.window = window
 		self.lastSavedSearch = ""
+		self.viewportPollToken = 0
+		self.collectGeneration = 0
 		self.cleanup(isAfterClose=False)
 
 	def cleanup(self, isAfterClose):
@@ -776,7 +2674,16 @@ class ISearch():
 		self.cursorOnOpen = -1
 		self.focus = ISearch.NO_FOCUS
 		self.forward = True
+		self.regex = False
+		self.allViews = False
 		self.treatCancelLikeDone = False
+		self.matches = None					# NOTE - Results of the previous search, which a longer query can narrow down
+		self.iFocus = -1					# NOTE - Index of self.focus.region in self.matches.regions
+		self.drawnMatches = None			# NOTE - Which matches have outlines drawn...
+		self.drawnRanges = {}				# ... and which index range of them, per view id
+		self.viewportPollMatches = None
+		self.viewportPollToken += 1			# NOTE - Stops any poll still in flight
+		self.collectGeneration += 1			# NOTE - Bumped by every search, so stale background collections know to give up
 
 		if isAfterClose:
 			trace(LOG_ISEARCH, "isAfterClose")
@@ -798,7 +2705,7 @@ class ISearch():
 	def isShowing(self):
 		return self.inputView and self.inputView.window()
 
-	def open(self, forward=True, addPrimaryCursorToMarkRing=True):
+	def open(self, forward=True, regex=False, allViews=False, addPrimaryCursorToMarkRing=True):
 		trace(LOG_ISEARCH, "open")
 
 		markSel = MarkSel.get(self.window.active_view())
@@ -808,6 +2715,8 @@ class ISearch():
 
 		self.cursorOnOpen = markSel.primaryCursor()
 		self.forward = forward
+		self.regex = regex
+		self.allViews = allViews
 		self.focus = ISearch.NO_FOCUS
 
 		trace(LOG_ISEARCH, "check if showing")
@@ -845,12 +2754,122 @@ class ISearch():
 				trace(LOG_ISEARCH, "no window? not hiding...")
 
 	def cleanupDrawings(self, view):
-		view.erase_regions(ISearch.FOUND_REGION_NAME)
+		self.cleanupFoundRegions(view)
 		view.erase_regions(ISearch.FOCUS_REGION_NAME)
 		view.erase_regions(ISearch.EXTRA_SELECTION_REGION_NAME)
 
+	def cleanupFoundRegions(self, view):
+		bufferEx = BufferEx.get(view)
+		for bufferView in bufferEx.views():
+			bufferView.erase_regions(ISearch.FOUND_REGION_NAME)
+
+		bufferEx.iSearchMatches = None
+		self.drawnMatches = None
+		self.drawnRanges = {}
+
+	def drawFoundRegions(self, view):
+		# NOTE - Outlines go in every view of the buffer (e.g. the mirrored one in the other group), all drawn from the
+		#  one match list we share through BufferEx
+		bufferEx = BufferEx.get(view)
+		bufferEx.iSearchMatches = self.matches
+
+		isViewportScoped = False
+		for bufferView in bufferEx.views():
+			isViewportScoped |= self.drawFoundRegionsInView(bufferView)
+
+		self.drawnMatches = self.matches
+		if isViewportScoped and self.viewportPollMatches is not self.matches:
+			self.pollViewport(view)
+
+	def drawFoundRegionsInView(self, view):
+		"""Returns whether the outlines are scoped to the viewport, so need redrawing as it scrolls"""
+		found = self.matches.regions
+		isViewportScoped = ISEARCH_VIEWPORT_HIGHLIGHT_MIN_MATCHES is not None and len(found) >= ISEARCH_VIEWPORT_HIGHLIGHT_MIN_MATCHES
+
+		if not isViewportScoped:
+			iBegin, iEnd = 0, len(found)
+		else:
+			# NOTE - Only outline what is on (or near) the screen
+			visible = view.visible_region()
+			margin = visible.size() * ISEARCH_VIEWPORT_MARGIN_SCREENS
+			iBegin = self.matches.iLastEndingAtOrBefore(visible.begin() - margin) + 1
+			iEnd = self.matches.iFirstStartingAtOrAfter(visible.end() + margin)
+
+			drawn = self.drawnRanges.get(view.id())
+			if drawn is not None and drawn[0] is self.matches:
+				iDrawnBegin, iDrawnEnd = drawn[1], drawn[2]
+				if iBegin >= iDrawnBegin and iEnd <= iDrawnEnd:
+					return isViewportScoped
+
+				isContiguous = iBegin <= iDrawnEnd and iEnd >= iDrawnBegin
+				if isContiguous and max(iEnd, iDrawnEnd) - min(iBegin, iDrawnBegin) <= ISEARCH_VIEWPORT_MAX_DRAWN:
+					iBegin, iEnd = min(iBegin, iDrawnBegin), max(iEnd, iDrawnEnd)
+
+		trace(LOG_ISEARCH, "drawing outlines for matches [{}, {}) of {} in view {}", iBegin, iEnd, len(found), view.id())
+
+		view.add_regions(
+			ISearch.FOUND_REGION_NAME,
+			found[iBegin:iEnd],
+			# NOTE - Doesn't actually push the scope, just sources color from it. No way that I know of to actually push the "scope" :(
+			scope=ISearch.FOUND_REGION_NAME,
+			flags=sublime.DRAW_NO_FILL)
+
+		self.drawnRanges[view.id()] = (self.matches, iBegin, iEnd)
+		return isViewportScoped
+
+	def pollViewport(self, view):
+		# NOTE - There's no scroll event, so this re-arms itself for as long as we have viewport-scoped outlines up.
+		#  Bumping the token stops any poll that is already in flight.
+		self.viewportPollToken += 1
+		self.viewportPollMatches = self.matches
+		token = self.viewportPollToken
+
+		def onPoll():
+			if token != self.viewportPollToken or not self.isShowing() or self.drawnMatches is not self.matches:
+				if token == self.viewportPollToken:
+					self.viewportPollMatches = None
+				return
+
+			for bufferView in BufferEx.get(view).views():
+				self.drawFoundRegionsInView(bufferView)
+
+			sublime.set_timeout(onPoll, ISEARCH_VIEWPORT_POLL_MS)
+
+		sublime.set_timeout(onPoll, ISEARCH_VIEWPORT_POLL_MS)
+
 	# --- Hooks
 
+	@staticmethod
+	def onBufferTextChanged(bufferEx, changes):
+		"""The buffer changed (typing, a revert, some tool rewriting the file...) while it had i-search outlines up"""
+		view = bufferEx.buffer.primary_view()
+		previous = bufferEx.iSearchMatches
+		matches = None
+		if changes and changes[0].a.change_count == previous.key[1]:
+			matches = ISearchMatchCache.rematch(view, previous, changes)
+			if matches is not None:
+				ISearchMatchCache.put(matches)
+		else:
+			trace(LOG_ISEARCH, "not rematching matches from change {}, they're stale", previous.key[1])
+
+		isOwned = False
+		for windowEx in WindowEx.dictionary.values():
+			iSearch = windowEx.iSearch
+			if iSearch.matches is not previous:
+				continue
+
+			isOwned = True
+			iSearch.matches = matches
+			iSearch.iFocus = -1		# NOTE - Focus may have moved, so the next search bisects for it instead of stepping
+			if matches is None:
+				iSearch.cleanupFoundRegions(view)
+			else:
+				iSearch.drawFoundRegions(view)
+				WindowEx.get(iSearch.window).showCustomStatus(f"Match ? of {len(matches.regions)}")
+
+		# NOTE - Even if no search is showing them, these must track the buffer, or the next edit would shift stale offsets
+		bufferEx.iSearchMatches = matches if isOwned else None
+
 	def onTextCommand(self, command_name, args):
 		# HMM - I'd rather use (poorly documented) "chain" command here, but that doesn't let me hook into the chained commands :(
 		#		Window seems to and Views seem not to but I've read on the internet that window sometimes messes up too... do I really
@@ -891,12 +2910,34 @@ class ISearch():
 
 	# --- Operations
 
+	@staticmethod
+	def searchFlags(text, regex):
+		# NOTE - Case sensitivity determined by input, like emacs. Escapes like \W or \S in a regex don't count as uppercase
+		if regex:
+			flags = 0
+			text = re.sub(r"\\.", "", text)
+		else:
+			flags = sublime.LITERAL
+
+		hasNoUppercase = all(not c.isupper() for c in text)
+		if hasNoUppercase:
+			flags |= sublime.IGNORECASE
+
+		return flags
+
+	def isFocusedOnMatch(self, matches, iMatch):
+		return matches is not None and \
+			   self.focus.region is not None and \
+			   iMatch >= 0 and iMatch < len(matches.regions) and \
+			   matches.regions[iMatch] == self.focus.region
+
 	def search(
 		self,
 		isRepeatedSearch,
-		edit=None):		# NOTE - required iff isRepeatedSearch
+		edit=None,		# NOTE - required iff isRepeatedSearch
+		wantDebounce=True):
 
-		trace(LOG_ISEARCH, f"BEGIN SEARCH FOR {self.text}")
+		trace(LOG_ISEARCH, "BEGIN SEARCH FOR {}", self.text)
 
 		if isRepeatedSearch != (edit is not None):		raise AssertionError("Repeated searches require an 'edit' to behave properly in the case of an empty 'self.text'")
 
@@ -921,65 +2962,93 @@ class ISearch():
 		primaryRegion = markSel.selectPrimaryRegion(markAction)
 
 		# Decide where to start search
+		# NOTE - Regex matches aren't len(self.text) long, so those just start from the edge of the focused match
+		textLen = 0 if self.regex else len(self.text)
 		searchFrom = None
 		if self.forward:
 			if self.focus.region:
-				searchFrom = self.focus.region.end() - len(self.text)
+				searchFrom = self.focus.region.end() - (self.focus.region.size() if self.regex else textLen)
 			else:
-				searchFrom = primaryRegion.end() - len(self.text)
+				searchFrom = primaryRegion.end() - textLen
 
 			if isRepeatedSearch:
 				searchFrom += 1
 		else:
 			if self.focus.region:
-				searchFrom = self.focus.region.begin() + len(self.text)
+				searchFrom = self.focus.region.begin() + (self.focus.region.size() if self.regex else textLen)
 			else:
-				searchFrom = primaryRegion.begin() + len(self.text)
+				searchFrom = primaryRegion.begin() + textLen
 
 			if isRepeatedSearch:
 				searchFrom -= 1
 
-		flags = sublime.LITERAL
-		hasNoUppercase = all(not c.isupper() for c in self.text)
-		if hasNoUppercase:
-			flags |= sublime.IGNORECASE
+		flags = ISearch.searchFlags(self.text, self.regex)
 
-		# Find all matches
-		# TODO - Cache matches if re-searching the same term and the buffer hasn't changed?
-		#        Would be useful when continually re-searching to cycle through found selections
+		self.collectGeneration += 1		# NOTE - Supersedes any background match collection still in flight
 
-		activeView = self.window.active_view()
-		found = activeView.find_all(self.text, flags=flags)
+		if self.allViews:
+			self.searchAllViews(searchFrom, flags, isRepeatedSearch, wantDebounce)
+			return
 
-		if len(found) > 0:
-			# Choose best match
+		# Find all matches
+		# NOTE - Cached, so continually re-searching to cycle through found selections doesn't rescan the buffer
 
-			debug_matchPrev = sublime.Region(-1, -1)
-			iBest = -1
+		activeView = self.window.active_view()
+		matches = ISearchMatchCache.lookup(
+			activeView,
+			self.text,
+			flags,
+			narrowFrom=None if isRepeatedSearch else self.matches)
+
+		isTyping = not isRepeatedSearch and wantDebounce and ISEARCH_DEBOUNCE_MS > 0
+
+		if matches is None and self.regex:
+			# NOTE - Half-typed patterns are often invalid or slow, so wait for a pause in typing before trying them at all
+			if isTyping:
+				self.debounceRegexSearch(activeView)
+				return
 
-			for i in range(len(found)):
+			self.scanRegex(activeView, flags, isRepeatedSearch)
+			return
 
-				match = found[i]
+		if matches is None:
+			# NOTE - Huge buffers are too big to find_all(..) on every keystroke, and while typing we'd rather wait for a pause
+			#  than count matches for a query that is about to change. Either way, jump to the nearest match right now
+			#  and count/outline the rest later
+			isHuge = activeView.size() >= ISEARCH_ASYNC_MIN_BUFFER_SIZE
+			if isHuge or isTyping:
+				self.searchNearest(activeView, searchFrom, flags, isRepeatedSearch, markSel, markAction, keepMark,
+									delay=ISEARCH_DEBOUNCE_MS if isTyping else 0)
+				return
 
-				if match.b < match.a:
-					raise AssertionError("find_all returned reversed region?")
+		if matches is None:
+			matches = ISearchMatchCache.findAll(activeView, self.text, flags)
 
-				if match.a <= debug_matchPrev.a:
-					raise AssertionError("find_all returned unsorted list?")
+		self.matches = matches
+		found = matches.regions
 
-				if self.forward and match.a >= searchFrom:
-					# NOTE - This one breaks the loop, since we can only get further away in an increasing list
-					iBest = i
-					break
+		if matches.error:
+			# NOTE - Leave the focus where it was, the pattern is probably just half-typed
+			windowEx.showCustomStatus(matches.error)
+			self.cleanupFoundRegions(activeView)
+			trace(LOG_ISEARCH, "{}", matches.error)
+			return
 
-				elif not self.forward and match.b <= searchFrom:
-					# NOTE - This one doesn't, since we can only get closer and continue updating our ideal
-					iBest = i
+		if len(found) > 0:
+			# Choose best match
+			# NOTE - Repeating a search from a match we focused just steps to its neighbour, otherwise we bisect the
+			#  sorted match offsets for the first match past where we want to start
 
-				debug_matchPrev = match
+			iBest = -1
+			if isRepeatedSearch and self.isFocusedOnMatch(self.matches, self.iFocus):
+				iBest = self.iFocus + 1 if self.forward else self.iFocus - 1
+			elif self.forward:
+				iBest = self.matches.iFirstStartingAtOrAfter(searchFrom)
+			else:
+				iBest = self.matches.iLastEndingAtOrBefore(searchFrom)
 
 			wrappedAround = False
-			if iBest == -1:
+			if iBest < 0 or iBest >= len(found):
 				if self.forward: 	iBest = 0				# wrap around to top match, HMM - require extra keypress to commit to wraparound?
 				else:				iBest = len(found) -1	# ... to bot match ...
 				wrappedAround = True
@@ -987,61 +3056,381 @@ class ISearch():
 			# --- Lock in the match
 
 			bestMatch = found[iBest]
-			self.focus = ISearch.Focus(ISearch.Focus.State.ACTIVE if isRepeatedSearch else ISearch.Focus.State.PASSIVE,
-										bestMatch)
-
-			markSel.select(self.focus.region, markAction, extend=keepMark)
-			markSel.hideSelection()
+			self.lockIn(activeView, bestMatch, iBest, isRepeatedSearch, markSel, markAction, keepMark)
 
 			windowEx.showCustomStatus(f"Match {iBest + 1} of {len(found)}")
 
-			primaryRegion = markSel.primaryRegion()
-			extraSelection = MarkSel.subtractRegion(primaryRegion, self.focus.region)
-
 			# --- Draw around the matches!
 
-			activeView.add_regions(
-				ISearch.FOUND_REGION_NAME,
-				found,
-				# NOTE - Doesn't actually push the scope, just sources color from it. No way that I know of to actually push the "scope" :(
-				scope=ISearch.FOUND_REGION_NAME,
-				flags=sublime.DRAW_NO_FILL)
+			self.drawFoundRegions(activeView)
+
+			if wrappedAround:
+				if self.forward:	trace(LOG_ISEARCH, "wraparound match found at ({}, {}) - ideal start: {})", bestMatch.a, bestMatch.b, searchFrom)
+				else:				trace(LOG_ISEARCH, "wraparound match (r) found at ({}, {}) - ideal end: {})", bestMatch.a, bestMatch.b, searchFrom)
+			else:
+				if self.forward:	trace(LOG_ISEARCH, "match found at ({}, {}) - ideal start: {})", bestMatch.a, bestMatch.b, searchFrom)
+				else:				trace(LOG_ISEARCH, "match (r) found at ({}, {}) - ideal end: {})", bestMatch.a, bestMatch.b, searchFrom)
+		else:
+			self.onNoMatches(activeView)
+
+	def debounceRegexSearch(self, view):
+		generation = self.collectGeneration
+		self.cleanupFoundRegions(view)
+		WindowEx.get(self.window).showCustomStatus("Match ? of ?")
+
+		def onSettled():
+			if generation == self.collectGeneration and self.isShowing() and self.text:
+				self.search(isRepeatedSearch=False, wantDebounce=False)
+
+		sublime.set_timeout(onSettled, ISEARCH_DEBOUNCE_MS)
+
+	def scanRegex(self, view, flags, isRepeatedSearch):
+		"""Scans the buffer for the regex on a background thread, then searches again once the matches are cached"""
+		generation = self.collectGeneration
+		key = ISearchMatchCache.makeKey(view, self.text, flags)
+		pattern, error = ISearchRegex.compile(self.text, key[3])
+		if pattern is None:
+			matches = ISearchMatches(key, [], error)
+			ISearchMatchCache.put(matches)		# NOTE - Invalid stays invalid, so there's no point compiling it again
+			self.onRegexScanned(generation, matches, isRepeatedSearch)
+			return
+
+		self.cleanupFoundRegions(view)
+		WindowEx.get(self.window).showCustomStatus("Match ? of ?")
+
+		def scan():
+			if generation != self.collectGeneration:
+				return
 
-			activeView.add_regions(
-				ISearch.FOCUS_REGION_NAME,
-				[self.focus.region],
-				scope=ISearch.FOCUS_REGION_NAME)
+			regions, error = ISearchRegex.scan(pattern, view.substr(sublime.Region(0, view.size())))
+			if view.change_count() != key[1]:
+				return		# NOTE - Buffer changed underneath us, and the search that changed it already superseded us
 
-			activeView.add_regions(
-				ISearch.EXTRA_SELECTION_REGION_NAME,
-				extraSelection,
-				scope=ISearch.EXTRA_SELECTION_REGION_NAME)
+			matches = ISearchMatches(key, regions, error)
+			sublime.set_timeout(lambda: self.onRegexScanned(generation, matches, isRepeatedSearch), 0)
 
-			if wrappedAround:
-				if self.forward:	trace(LOG_ISEARCH, f"wraparound match found at ({match.a}, {match.b}) - ideal start: {searchFrom})")
-				else:				trace(LOG_ISEARCH, f"wraparound match (r) found at ({match.a}, {match.b}) - ideal end: {searchFrom})")
+		sublime.set_timeout_async(scan, 0)
+
+	def onRegexScanned(self, generation, matches, isRepeatedSearch):
+		if not matches.error:
+			ISearchMatchCache.put(matches)		# NOTE - Never a timeout, the next try might finish (e.g. with less running)
+
+		if generation != self.collectGeneration or not self.isShowing():
+			return		# NOTE - Late result for a query that's since changed
+
+		if matches.error:
+			# NOTE - Leave the focus where it was, the pattern is probably just half-typed
+			self.matches = matches
+			WindowEx.get(self.window).showCustomStatus(matches.error)
+			self.cleanupFoundRegions(self.window.active_view())
+			trace(LOG_ISEARCH, "{}", matches.error)
+			return
+
+		self.search(isRepeatedSearch=isRepeatedSearch, wantDebounce=False)
+
+	def searchNearest(self, view, searchFrom, flags, isRepeatedSearch, markSel, markAction, keepMark, delay):
+		match = None
+		if self.forward:
+			match = view.find(self.text, searchFrom, flags)
+			if match.a < 0:
+				match = view.find(self.text, 0, flags)	# wrap around to top match
+		else:
+			match = ISearch.findLastEndingAtOrBefore(view, self.text, flags, searchFrom, 0)
+			if match.a < 0:
+				match = ISearch.findLastEndingAtOrBefore(view, self.text, flags, view.size(), searchFrom)	# ... to bot match ...
+
+		self.matches = None
+
+		if match.a < 0:
+			self.onNoMatches(view)
+			return
+
+		trace(LOG_ISEARCH, "nearest match found at ({}, {}) - ideal {}: {}", match.a, match.b, "start" if self.forward else "end", searchFrom)
+
+		self.lockIn(view, match, -1, isRepeatedSearch, markSel, markAction, keepMark)
+		self.cleanupFoundRegions(view)
+		WindowEx.get(self.window).showCustomStatus("Match ? of ?")
+
+		self.collectMatches(view, flags, delay)
+
+	@staticmethod
+	def findLastEndingAtOrBefore(view, text, flags, end, stop):
+		# NOTE - The API has no reverse find(..), so walk backwards a chunk at a time. Chunks overlap by len(text) - 1 so
+		#  matches straddling the seam aren't missed
+		ignoreCase = bool(flags & sublime.IGNORECASE)
+		if ignoreCase:
+			text = text.lower()
+
+		while end - stop >= len(text):
+			begin = max(stop, end - ISEARCH_REVERSE_CHUNK_SIZE)
+			chunk = view.substr(sublime.Region(begin, end))
+			if ignoreCase:
+				chunk = chunk.lower()
+
+			i = chunk.rfind(text)
+			if i >= 0:
+				return sublime.Region(begin + i, begin + i + len(text))
+
+			end = begin + len(text) - 1
+			if begin == stop:
+				break
+
+		return sublime.Region(-1, -1)
+
+	def collectMatches(self, view, flags, delay):
+		"""Runs find_all(..) after delay ms, unless another search comes along first. Huge buffers get it off the UI thread"""
+		generation = self.collectGeneration
+		key = ISearchMatchCache.makeKey(view, self.text, flags)
+		text = self.text
+
+		def collect():
+			if generation != self.collectGeneration:
+				trace(LOG_ISEARCH, "skipping superseded match collection for {}", text)
+				return
+
+			regions = view.find_all(text, flags=flags)
+			if view.change_count() != key[1]:
+				return		# NOTE - Buffer changed underneath us, so these can't be trusted (or cached)
+
+			matches = ISearchMatches(key, regions)
+			sublime.set_timeout(lambda: self.onMatchesCollected(generation, matches), 0)
+
+		def schedule():
+			if generation != self.collectGeneration:
+				return
+
+			if view.size() >= ISEARCH_ASYNC_MIN_BUFFER_SIZE:
+				sublime.set_timeout_async(collect, 0)
 			else:
-				if self.forward:	trace(LOG_ISEARCH, f"match found at ({match.a}, {match.b}) - ideal start: {searchFrom})")
-				else:				trace(LOG_ISEARCH, f"match (r) found at ({match.a}, {match.b}) - ideal end: {searchFrom})")
+				collect()
+
+		if delay > 0:
+			sublime.set_timeout(schedule, delay)
+		else:
+			schedule()
+
+	def onMatchesCollected(self, generation, matches):
+		ISearchMatchCache.put(matches)
+
+		if generation != self.collectGeneration or not self.isShowing() or self.focus.region is None:
+			return
+
+		view = self.window.active_view()
+		if view.buffer_id() != matches.key[0]:
+			return
+
+		self.matches = matches
+		self.iFocus = matches.iFirstStartingAtOrAfter(self.focus.region.begin())
+		if self.isFocusedOnMatch(matches, self.iFocus):
+			WindowEx.get(self.window).showCustomStatus(f"Match {self.iFocus + 1} of {len(matches.regions)}")
+		else:
+			self.iFocus = -1
+			WindowEx.get(self.window).showCustomStatus(f"Match ? of {len(matches.regions)}")
+
+		self.drawFoundRegions(view)
+
+	def lockIn(self, view, region, iMatch, isRepeatedSearch, markSel, markAction, keepMark):
+		self.focus = ISearch.Focus(ISearch.Focus.State.ACTIVE if isRepeatedSearch else ISearch.Focus.State.PASSIVE,
+									region)
+		self.iFocus = iMatch
+
+		markSel.select(self.focus.region, markAction, extend=keepMark)
+		markSel.hideSelection()
+
+		primaryRegion = markSel.primaryRegion()
+		extraSelection = MarkSel.subtractRegion(primaryRegion, self.focus.region)
+
+		view.add_regions(
+			ISearch.FOCUS_REGION_NAME,
+			[self.focus.region],
+			scope=ISearch.FOCUS_REGION_NAME)
+
+		view.add_regions(
+			ISearch.EXTRA_SELECTION_REGION_NAME,
+			extraSelection,
+			scope=ISearch.EXTRA_SELECTION_REGION_NAME)
+
+	# --- Searching every open view
+	#		Each buffer (just one of its views, since sync_views mirrors everything) is snapshotted with substr(..) and
+	#		scanned on a thread pool. Results are kept per buffer in BufferEx, so only buffers that changed get rescanned.
+
+	def viewsToSearch(self):
+		# NOTE - Prefer the active group's view of each buffer, so hopping between files stays on this side
+		result = []
+		bufferIds = set()
+		for view in self.window.views_in_group(self.window.active_group()) + self.window.views():
+			if view.buffer_id() not in bufferIds:
+				bufferIds.add(view.buffer_id())
+				result.append(view)
+
+		return result
+
+	def searchAllViews(self, searchFrom, flags, isRepeatedSearch, wantDebounce):
+		generation = self.collectGeneration
+		text = self.text
+		views = self.viewsToSearch()
+		results = [ISearch.lookupAllViews(view, text, flags) for view in views]
+		iMisses = [i for i in range(len(views)) if results[i] is None]
+
+		if not iMisses:
+			self.onAllViewsSearched(views, results, searchFrom, isRepeatedSearch)
+			return
+
+		WindowEx.get(self.window).showCustomStatus(f"Match ? of ? across {len(views)} files")
+
+		def snapshot():
+			if generation != self.collectGeneration:
+				return
+
+			pattern, error = ISearchRegex.compile(text, flags)
+			jobs = []
+			for i in iMisses:
+				view = views[i]
+				jobs.append((i, ISearchMatchCache.makeKey(view, text, flags), view.substr(sublime.Region(0, view.size()))))
+
+			def scan(job):
+				if pattern is None:
+					return [], error
+
+				if flags & sublime.LITERAL:
+					return ISearchMatchCache.findAllInText(job[2], text, flags), None		# NOTE - No backtracking, so no budget
+
+				return ISearchRegex.scan(pattern, job[2])
+
+			def scanAll():
+				if generation != self.collectGeneration:
+					return
+
+				scanned = list(ISearch.pool().map(scan, jobs))
+				sublime.set_timeout(lambda: onScanned(jobs, scanned), 0)
+
+			sublime.set_timeout_async(scanAll, 0)
+
+		def onScanned(jobs, scanned):
+			for (i, key, _), (regions, error) in zip(jobs, scanned):
+				results[i] = ISearchMatches(key, regions, error)
+				isTimeout = error is not None and ISearchRegex.compile(text, flags)[0] is not None
+				if not isTimeout and views[i].is_valid() and views[i].change_count() == key[1]:
+					BufferEx.get(views[i]).allViewsMatches = results[i]
+
+			if generation == self.collectGeneration and self.isShowing():
+				self.onAllViewsSearched(views, results, searchFrom, isRepeatedSearch)
+
+		if not isRepeatedSearch and wantDebounce and ISEARCH_DEBOUNCE_MS > 0:
+			sublime.set_timeout(snapshot, ISEARCH_DEBOUNCE_MS)
 		else:
-			# TODO - play beep here?
-			windowEx.showCustomStatus(f"No matches")
-			self.focus = ISearch.Focus(ISearch.Focus.State.NIL, None)
+			snapshot()
+
+	@staticmethod
+	def lookupAllViews(view, text, flags):
+		key = ISearchMatchCache.makeKey(view, text, flags)
+		matches = BufferEx.get(view).allViewsMatches
+		if matches is not None and matches.key == key:
+			return matches
+
+		return ISearchMatchCache.lookup(view, text, flags)
+
+	@staticmethod
+	def pool():
+		if ISearch.allViewsPool is None:
+			ISearch.allViewsPool = concurrent.futures.ThreadPoolExecutor(max_workers=ISEARCH_ALL_VIEWS_WORKERS)
+
+		return ISearch.allViewsPool
+
+	def onAllViewsSearched(self, views, results, searchFrom, isRepeatedSearch):
+		activeView = self.window.active_view()
+
+		# NOTE - A regex can time out in one big file and not the others, so only give up outright if it failed everywhere
+		errors = [(views[i], results[i].error) for i in range(len(views)) if results[i].error]
+		if errors and len(errors) == len(views):
+			WindowEx.get(self.window).showCustomStatus(errors[0][1])
+			return
+
+		errorNote = ""
+		if len(errors) == 1:
+			errorNote = f" ({os.path.basename(errors[0][0].file_name() or errors[0][0].name() or 'untitled')}: {errors[0][1]})"
+		elif errors:
+			errorNote = f" ({errors[0][1]} in {len(errors)} files)"
+
+		hits = [(i, views[i], results[i]) for i in range(len(views)) if results[i].regions]
+		if not hits:
+			self.onNoMatches(activeView)
+			if errorNote:
+				WindowEx.get(self.window).showCustomStatus(f"No matches{errorNote}")
+			return
+
+		# --- Find the active view among the hits (or where it would be)
+
+		iActive = next((i for i in range(len(views)) if views[i].buffer_id() == activeView.buffer_id()), -1)
+		iHit = next((iHit for iHit in range(len(hits)) if hits[iHit][0] >= iActive), len(hits))
+		isActiveHit = iHit < len(hits) and hits[iHit][0] == iActive
+
+		# --- Choose best match, hopping to the next/prev file with matches if we run off the end of this one
+
+		iMatch = -1
+		if isActiveHit:
+			matches = hits[iHit][2]
+			if isRepeatedSearch and self.isFocusedOnMatch(matches, self.iFocus):
+				iMatch = self.iFocus + 1 if self.forward else self.iFocus - 1
+			elif self.forward:
+				iMatch = matches.iFirstStartingAtOrAfter(searchFrom)
+			else:
+				iMatch = matches.iLastEndingAtOrBefore(searchFrom)
+
+			if iMatch < 0 or iMatch >= len(matches.regions):
+				iHit += 1 if self.forward else -1
+				iMatch = -1
+		elif not self.forward:
+			iHit -= 1
+
+		iHit %= len(hits)
+		_, view, matches = hits[iHit]
+		if iMatch < 0:
+			iMatch = 0 if self.forward else len(matches.regions) - 1
+
+		# --- Lock in the match, in whichever view it's in
+
+		if view.id() != activeView.id():
+			trace(LOG_ISEARCH, "hopping to {}", view.file_name())
+			MarkSel.get(activeView).showSelection()
 			self.cleanupDrawings(activeView)
+			WindowEx.get(self.window).clearCustomStatus()
+			self.window.focus_view(view)
+			self.window.focus_view(self.inputView)
+
+		markSel = MarkSel.get(view)
+		keepMark = markSel.isMarkActive()
+		self.lockIn(view, matches.regions[iMatch], iMatch, isRepeatedSearch, markSel, MarkAction.KEEP if keepMark else MarkAction.CLEAR, keepMark)
+
+		self.matches = matches
+		self.drawFoundRegions(view)
+
+		iGlobal = sum(len(hit[2].regions) for hit in hits[:iHit]) + iMatch
+		total = sum(len(hit[2].regions) for hit in hits)
+		WindowEx.get(self.window).showCustomStatus(f"Match {iGlobal + 1} of {total} across {len(hits)} files{errorNote}")
 
-			if self.forward:	trace(LOG_ISEARCH, "No match found")
-			else: 				trace(LOG_ISEARCH, "No match (r) found")
+	def onNoMatches(self, view):
+		# TODO - play beep here?
+		WindowEx.get(self.window).showCustomStatus(f"No matches")
+		self.focus = ISearch.Focus(ISearch.Focus.State.NIL, None)
+		self.iFocus = -1
+		self.cleanupDrawings(view)
+
+		if self.forward:	trace(LOG_ISEARCH, "No match found")
+		else: 				trace(LOG_ISEARCH, "No match (r) found")
 
 
 
 class AlsIncrementalSearch(sublime_plugin.TextCommand):		# NOTE - TextCommand instead of WindowCommand
 															#	TextCommand gives us access to the view, which lets us detect re-search
-	def run(self, edit, forward=True):
+	@instrumented
+	def run(self, edit, forward=True, regex=False, all_views=False):
 
 		iSearch = ISearch.get(self.view.window())
 
 		# --- Detect re-search
 		# TODO
+		# NOTE - Re-searching sticks with whatever regex/all-views mode the search was opened in
 		if self.view.element() == InputPanel.ELEMENT_NAME:
 			iSearch.forward = forward
 			iSearch.search(isRepeatedSearch=True, edit=edit)
@@ -1052,11 +3441,679 @@ class AlsIncrementalSearch(sublime_plugin.TextCommand):		# NOTE - TextCommand in
 			return
 
 		# --- We're just inside a normal view
-		iSearch.open(forward)
+		iSearch.open(forward, regex, all_views)
+
+
+# --- Project trigram index
+#		Maps every 3-byte sequence (lowercased) in the files under a window's folders to the files that contain it, so a
+#		query only has to read the files that contain all of its trigrams. Built on a background thread the first time
+#		project search is used, kept up to date from save/load events and pickled to the cache dir between sessions.
+#		Postings are sorted arrays of 32-bit file ids, since a big tree has millions of them.
+#		NOTE - Postings are only ever added to on update, never removed. A stale posting just costs a wasted file read
+#		 when querying, and the next full rebuild drops it.
+
+PROJECT_INDEX_MAX_FILE_SIZE		= 1024 * 1024
+PROJECT_INDEX_SKIP_DIRS			= { ".git", ".hg", ".svn", ".vs", "node_modules", "__pycache__" }
+PROJECT_INDEX_SAVE_DELAY_MS		= 30 * 1000
+PROJECT_INDEX_MAX_RESULTS		= 1000
+PROJECT_INDEX_MAX_FILES			= 20000
+PROJECT_INDEX_MAX_TOTAL_BYTES	= 256 * 1024 * 1024		# NOTE - Of file contents. Past this (or the file count) the rest isn't indexed
+PROJECT_INDEX_VERSION			= 2
+
+class ProjectIndex():
+	dictionary = {}		# NOTE - Keyed by the (sorted) folders, so windows with the same folders share an index
+
+	def __init__(self, folders):
+		self.folders = folders
+		self.lock = threading.Lock()
+		self.paths = []				# NOTE - file id -> path
+		self.ids = {}				# NOTE - path -> file id
+		self.stats = []				# NOTE - file id -> (size, mtime, is indexed), or None if it's gone
+		self.postings = {}			# NOTE - trigram (see trigrams()) -> sorted array of file ids
+		self.indexedBytes = 0
+		self.isCapped = False		# NOTE - Hit PROJECT_INDEX_MAX_FILES/PROJECT_INDEX_MAX_TOTAL_BYTES, so some files are missing
+		self.isReady = False
+		self.isSaveScheduled = False
+
+	@staticmethod
+	def get(window):
+		folders = tuple(sorted(window.folders()))
+		if not folders:
+			return None
+
+		result = ProjectIndex.dictionary.get(folders)
+		if result is None:
+			result = ProjectIndex(folders)
+			ProjectIndex.dictionary[folders] = result
+			threading.Thread(target=result.build, daemon=True).start()
+
+		return result
+
+	@staticmethod
+	def find(window):
+		"""The window's index if something already asked for it, otherwise None. Doesn't start a build"""
+		return ProjectIndex.dictionary.get(tuple(sorted(window.folders())))
+
+	@staticmethod
+	def trigrams(data):
+		"""Set of every 3-byte sequence in data, each as a little-endian int"""
+		# NOTE - Reads data as 32-bit words at each of the 4 alignments, so the per-byte work stays in C. A trailing zero
+		#  lets the last trigram fill a word, and the mask drops each word's 4th byte
+		data += b"\0"
+		words = set()
+		for k in range(4):
+			words.update(array.array("I", data[k:k + (len(data) - k) // 4 * 4]))
+
+		if sys.byteorder == "little":
+			return { word & 0xFFFFFF for word in words }
+
+		return { int.from_bytes(word.to_bytes(4, "big")[:3], "little") for word in words }
+
+	def cachePath(self):
+		name = hashlib.sha1("\n".join(self.folders).encode("utf-8")).hexdigest()
+		return os.path.join(sublime.cache_path(), "AlsEmacs", f"trigrams-{name}.pickle")
+
+	def contains(self, path):
+		return any(path.startswith(os.path.join(folder, "")) for folder in self.folders)
+
+	# --- Building/updating (background thread)
+
+	def build(self):
+		start = time.perf_counter()
+		self.load()
+
+		for folder in self.folders:
+			for directory, dirNames, fileNames in os.walk(folder):
+				dirNames[:] = [dirName for dirName in dirNames if dirName not in PROJECT_INDEX_SKIP_DIRS]
+				for fileName in fileNames:
+					self.update(os.path.join(directory, fileName))
+
+		self.isReady = True
+		self.save()
+		trace(LOG_PROJECT_INDEX, "indexed {} files under {} in {:.2f}s", len(self.paths), self.folders, time.perf_counter() - start)
+
+	def update(self, path):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			stat = None
+
+		with self.lock:
+			iFile = self.ids.get(path)
+			newStat = (stat.st_size, stat.st_mtime_ns) if stat else None
+			oldStat = self.stats[iFile] if iFile is not None else None
+			if oldStat is not None and oldStat[:2] == newStat:
+				return
+
+			if iFile is None and (len(self.paths) >= PROJECT_INDEX_MAX_FILES or self.indexedBytes >= PROJECT_INDEX_MAX_TOTAL_BYTES):
+				self.isCapped = True
+				return
+
+		data = None
+		if newStat and newStat[0] <= PROJECT_INDEX_MAX_FILE_SIZE:
+			try:
+				with open(path, "rb") as file:
+					data = file.read()
+			except OSError:
+				pass
+
+		if data is not None and b"\0" in data[:8192]:
+			data = None		# NOTE - Binary
+
+		grams = ProjectIndex.trigrams(data.lower()) if data is not None else ()
+
+		with self.lock:
+			if iFile is None:
+				iFile = len(self.paths)
+				self.paths.append(path)
+				self.ids[path] = iFile
+				self.stats.append(None)
+
+			self.indexedBytes += (len(data) if data is not None else 0) - (oldStat[0] if oldStat is not None and oldStat[2] else 0)
+			self.stats[iFile] = newStat + (data is not None,) if newStat else None
+			for gram in grams:
+				posting = self.postings.get(gram)
+				if posting is None:
+					self.postings[gram] = array.array("I", (iFile,))
+				elif posting[-1] < iFile:
+					posting.append(iFile)		# NOTE - Ids only grow while building, so this is the common case
+				else:
+					i = bisect.bisect_left(posting, iFile)
+					if posting[i] != iFile:
+						posting.insert(i, iFile)
+
+		if self.isReady:
+			self.scheduleSave()
+
+	def load(self):
+		try:
+			with open(self.cachePath(), "rb") as file:
+				version, folders, paths, stats, postings = pickle.load(file)
+		except Exception:
+			return		# NOTE - Missing/corrupt/old cache, just build from scratch
+
+		if version != PROJECT_INDEX_VERSION or folders != self.folders:
+			return
+
+		with self.lock:
+			self.paths, self.stats, self.postings = paths, stats, postings
+			self.ids = { path: iFile for iFile, path in enumerate(paths) }
+			self.indexedBytes = sum(stat[0] for stat in stats if stat is not None and stat[2])
+
+	def save(self):
+		with self.lock:
+			state = pickle.dumps((PROJECT_INDEX_VERSION, self.folders, self.paths, self.stats, self.postings), pickle.HIGHEST_PROTOCOL)
+			self.isSaveScheduled = False
+
+		path = self.cachePath()
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path + ".tmp", "wb") as file:
+			file.write(state)
+
+		os.replace(path + ".tmp", path)
+
+	def scheduleSave(self):
+		if not self.isSaveScheduled:
+			self.isSaveScheduled = True
+			sublime.set_timeout_async(self.save, PROJECT_INDEX_SAVE_DELAY_MS)
+
+	# --- Querying
+
+	def candidates(self, needle):
+		with self.lock:
+			if len(needle) < 3:
+				return [path for path, stat in zip(self.paths, self.stats) if stat is not None and stat[2]]
+
+			postings = sorted((self.postings.get(gram, ()) for gram in ProjectIndex.trigrams(needle)), key=len)
+			iFiles = set(postings[0])
+			for posting in postings[1:]:
+				iFiles.intersection_update(posting)
+				if not iFiles:
+					break
+
+			return [self.paths[iFile] for iFile in sorted(iFiles) if self.stats[iFile] is not None and self.stats[iFile][2]]
+
+	def query(self, text):
+		"""Returns ([(path, row, col, line text)], number of candidate files). Same smart case rules as ISearch"""
+		flags = ISearch.searchFlags(text, regex=False)
+		needle = text.encode("utf-8")
+		pattern = re.compile(re.escape(needle), re.IGNORECASE if flags & sublime.IGNORECASE else 0)
+		candidates = self.candidates(needle.lower())
+
+		results = []
+		for path in candidates:
+			try:
+				with open(path, "rb") as file:
+					data = file.read()
+			except OSError:
+				continue
+
+			for match in pattern.finditer(data):
+				lineBegin = data.rfind(b"\n", 0, match.start()) + 1
+				lineEnd = data.find(b"\n", match.start())
+				lineEnd = len(data) if lineEnd < 0 else lineEnd
+				row = data.count(b"\n", 0, match.start())
+				col = len(data[lineBegin:match.start()].decode("utf-8", "replace"))
+				results.append((path, row, col, data[lineBegin:lineEnd].decode("utf-8", "replace").strip()))
+
+				if len(results) >= PROJECT_INDEX_MAX_RESULTS:
+					return results, len(candidates)
+
+		return results, len(candidates)
+
+class ProjectSearch():
+	"""ISearch-style panel over ProjectIndex. Counts update as you type, and committing lists the matches to jump to"""
+
+	PANEL_NAME = "project-search"
+
+	@staticmethod
+	def get(window):
+		return WindowEx.get(window).projectSearch
+
+	def __init__(self, window):
+		self.window = window
+		self.text = ""
+		self.results = []
+		self.resultsText = None		# NOTE - The query self.results came from, which lags behind self.text while typing
+		self.generation = 0
+
+	def open(self):
+		index = ProjectIndex.get(self.window)
+		if index is None:
+			sublime.status_message("project-search: no folders open")
+			return
+
+		self.window.show_input_panel(ProjectSearch.PANEL_NAME, self.text, self.onDone, self.onChange, self.onCancel)
+
+	def onChange(self, text):
+		self.text = text
+		self.query(text, ISEARCH_DEBOUNCE_MS)
+
+	def query(self, text, delay, onReady=None):
+		self.generation += 1
+		generation = self.generation
+
+		if len(text.encode("utf-8")) < 3:
+			WindowEx.get(self.window).showCustomStatus("project-search needs at least 3 characters")
+			return
+
+		def run():
+			if generation != self.generation:
+				return
+
+			index = ProjectIndex.get(self.window)
+			start = time.perf_counter()
+			results, candidateCt = index.query(text)
+			elapsedMs = (time.perf_counter() - start) * 1000
+
+			def show():
+				if generation != self.generation:
+					return
+
+				self.results = results
+				self.resultsText = text
+				building = "" if index.isReady else ", index still building"
+				if index.isCapped:
+					building += f", index capped at {len(index.paths)} files"
+				files = len(set(result[0] for result in results))
+				WindowEx.get(self.window).showCustomStatus(
+					f"{len(results)} matches in {files} files ({candidateCt} candidates, {elapsedMs:.0f}ms{building})")
+
+				if onReady:
+					onReady()
+
+			sublime.set_timeout(show, 0)
+
+		sublime.set_timeout_async(run, delay)
+
+	def onDone(self, text):
+		self.text = text
+		if text == self.resultsText:
+			self.showResults()
+			return
+
+		# NOTE - Committed before the query caught up with the typing, so run it now and list its results once they land
+		self.query(text, 0, onReady=self.showResults)
+
+	def showResults(self):
+		WindowEx.get(self.window).clearCustomStatus()
+		results = self.results
+		if not results:
+			sublime.status_message(f"project-search: no matches for {self.resultsText}")
+			return
+
+		items = [[f"{os.path.basename(path)}:{row + 1}", lineText] for path, row, col, lineText in results]
+
+		def onSelect(i):
+			if i >= 0:
+				path, row, col, _ = results[i]
+				self.window.open_file(f"{path}:{row + 1}:{col + 1}", sublime.ENCODED_POSITION)
+
+		self.window.show_quick_panel(items, onSelect)
+
+	def onCancel(self):
+		self.generation += 1
+		WindowEx.get(self.window).clearCustomStatus()
+
+class AlsProjectSearch(sublime_plugin.WindowCommand):
+	@instrumented
+	def run(self):
+		ProjectSearch.get(self.window).open()
+
+
+# --- Brute-force grep
+#		Fallback for when there's no index: grep every file under the active file's directory. The walk happens on a
+#		thread, and each file gets matched in a pool of worker interpreters (the same kind the i-search regex mode uses), so
+#		the matching runs on every core instead of behind the plugin host's GIL. Results stream into an output panel.
+#		If no worker can be started the files are matched in-process through memory maps (re can search an mmap directly).
+
+GREP_PANEL_NAME			= "als_grep"
+GREP_MAX_FILE_SIZE		= 256 * 1024 * 1024
+GREP_FLUSH_MS			= 50
+GREP_WORKERS			= os.cpu_count() or 4
+
+GREP_WORKER_BOOTSTRAP = """
+import json, mmap, os, re, sys
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+def grepFile(path, pattern, maxSize):
+	matches = []
+	try:
+		with open(path, "rb") as file:
+			size = os.fstat(file.fileno()).st_size
+			if size == 0 or size > maxSize:
+				return matches
+			with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+				if data.find(b"\\0", 0, 8192) >= 0:
+					return matches
+				row = 0
+				rowBegin = 0
+				for match in pattern.finditer(data):
+					lineBegin = data.rfind(b"\\n", 0, match.start()) + 1
+					row += data[rowBegin:lineBegin].count(b"\\n")
+					rowBegin = lineBegin
+					lineEnd = data.find(b"\\n", match.start())
+					lineEnd = len(data) if lineEnd < 0 else lineEnd
+					col = len(data[lineBegin:match.start()].decode("utf-8", "replace"))
+					matches.append((row, col, data[lineBegin:lineEnd].decode("utf-8", "replace").strip()))
+	except (OSError, ValueError):
+		pass
+	return matches
+while True:
+	line = stdin.readline()
+	if not line:
+		break
+	request = json.loads(line)
+	pattern = re.compile(request["pattern"].encode("latin-1"), request["flags"])
+	stdout.write(json.dumps(grepFile(request["path"], pattern, request["maxSize"])).encode("utf-8") + b"\\n")
+	stdout.flush()
+"""
+
+class GrepWorker():
+	idle = []				# NOTE - Shared by every window, like RegexWorker's
+	lock = threading.Lock()
+	isUnavailable = False	# NOTE - Set if a fresh worker dies before answering, then every grep matches in-process
+
+	@staticmethod
+	def acquire():
+		"""Returns an idle worker, starting one if need be. None if the interpreter can't be started"""
+		with GrepWorker.lock:
+			while GrepWorker.idle:
+				worker = GrepWorker.idle.pop()
+				if worker.process.poll() is None:
+					return worker
+
+		if ISEARCH_REGEX_WORKER_COMMAND is None or GrepWorker.isUnavailable:
+			return None
+
+		code = base64.b64encode(GREP_WORKER_BOOTSTRAP.encode("utf-8")).decode("ascii")
+		try:
+			process = subprocess.Popen(
+				[ISEARCH_REGEX_WORKER_COMMAND, "-u", "-c", f"import base64; exec(base64.b64decode('{code}'))"],
+				stdin=subprocess.PIPE,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.DEVNULL,
+				creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+		except OSError as e:
+			trace(LOG_GREP, "failed to start grep worker: {}", e)
+			return None
+
+		return GrepWorker(process)
+
+	@staticmethod
+	def stopAll():
+		with GrepWorker.lock:
+			workers, GrepWorker.idle = GrepWorker.idle, []
+
+		for worker in workers:
+			worker.process.kill()
+
+	def __init__(self, process):
+		self.process = process
+		self.isKilled = False
+		self.isFresh = True
+
+	def release(self):
+		with GrepWorker.lock:
+			if not self.isKilled and self.process.poll() is None and len(GrepWorker.idle) < GREP_WORKERS:
+				GrepWorker.idle.append(self)
+				return
+
+		self.process.kill()
+
+	def kill(self):
+		self.isKilled = True
+		self.process.kill()
+
+	def grep(self, path, pattern):
+		"""Returns [(row, col, line text)] for each match in the file, or None if the worker died"""
+		request = { "path": path, "pattern": pattern.pattern.decode("latin-1"), "flags": pattern.flags, "maxSize": GREP_MAX_FILE_SIZE }
+		try:
+			self.process.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+			self.process.stdin.flush()
+			matches = json.loads(self.process.stdout.readline())
+		except (OSError, ValueError):
+			matches = None
+
+		if matches is None:
+			if self.isFresh and not self.isKilled:
+				trace(LOG_GREP, "grep worker exited before its first file, matching in-process from now on")
+				GrepWorker.isUnavailable = True
+
+			self.kill()
+			return None
+
+		self.isFresh = False
+		return matches
+
+class Grep():
+
+	@staticmethod
+	def get(window):
+		return WindowEx.get(window).grep
+
+	def __init__(self, window):
+		self.window = window
+		self.generation = 0
+		self.lock = threading.Lock()
+		self.pending = []			# NOTE - Output lines waiting for the next flush into the panel
+		self.workers = set()		# NOTE - Busy grep workers, killed if the grep they're working for gets cancelled
+		self.finishedGeneration = 0
+		self.lastText = ""
+
+	def open(self):
+		view = self.window.active_view()
+		if not view or not view.file_name():
+			sublime.status_message("grep: active view has no file, so no directory to search")
+			return
+
+		self.window.show_input_panel("grep", self.lastText, self.start, None, None)
+
+	def start(self, text):
+		if not text:
+			return
+
+		self.lastText = text
+		directory = os.path.dirname(self.window.active_view().file_name())
+
+		self.generation += 1		# NOTE - Cancels any grep still running
+		generation = self.generation
+
+		with self.lock:
+			self.pending = []
+			workers, self.workers = self.workers, set()
+
+		for worker in workers:
+			worker.kill()
+
+		panel = self.window.create_output_panel(GREP_PANEL_NAME)
+		panel.settings().set("result_file_regex", r"^(.+?):(\d+):(\d+): ")
+		panel.settings().set("result_base_dir", directory)
+		panel.run_command("append", { "characters": f"grep '{text}' under {directory}\n\n" })
+		self.window.run_command("show_panel", { "panel": f"output.{GREP_PANEL_NAME}" })
+
+		# NOTE - Same smart case rules as ISearch
+		flags = ISearch.searchFlags(text, regex=False)
+		pattern = re.compile(re.escape(text.encode("utf-8")), re.IGNORECASE if flags & sublime.IGNORECASE else 0)
+
+		threading.Thread(target=self.run, args=(generation, directory, pattern), daemon=True).start()
+		sublime.set_timeout(lambda: self.flush(generation, panel), GREP_FLUSH_MS)
+
+	def run(self, generation, directory, pattern):
+		start = time.perf_counter()
+		paths = queue.Queue()
+		counts = [0, 0, 0]		# NOTE - Matches, files with matches, files searched
+		feeders = [threading.Thread(target=self.feed, args=(generation, paths, directory, pattern, counts), daemon=True) for _ in range(GREP_WORKERS)]
+		for feeder in feeders:
+			feeder.start()
+
+		try:
+			for root, dirNames, fileNames in os.walk(directory):
+				if generation != self.generation:
+					return
+
+				dirNames[:] = [dirName for dirName in dirNames if dirName not in PROJECT_INDEX_SKIP_DIRS]
+				for fileName in fileNames:
+					paths.put(os.path.join(root, fileName))
+		finally:
+			for _ in feeders:
+				paths.put(None)
+
+		for feeder in feeders:
+			feeder.join()
+
+		if generation == self.generation:
+			matchCt, fileCt, searchedCt = counts
+			self.post([f"\n{matchCt} matches in {fileCt} files ({searchedCt} searched) in {time.perf_counter() - start:.2f}s\n"])
+			self.finishedGeneration = generation
+
+	def feed(self, generation, paths, directory, pattern, counts):
+		"""Hands the walked paths to a grep worker one at a time, and posts what it finds. Runs on its own thread"""
+		worker = None
+		while True:
+			path = paths.get()
+			if path is None or generation != self.generation:
+				break
+
+			if worker is None:
+				worker = GrepWorker.acquire()
+				if worker is not None:
+					with self.lock:
+						self.workers.add(worker)
+
+			matches = worker.grep(path, pattern) if worker is not None else None
+			if matches is None:
+				if worker is not None:
+					with self.lock:
+						self.workers.discard(worker)
+
+					worker = None
+
+				if generation != self.generation:
+					break
+
+				matches = Grep.grepFile(path, pattern, lambda: generation != self.generation)
+
+			lines = [f"{os.path.relpath(path, directory)}:{row + 1}:{col + 1}: {lineText}\n" for row, col, lineText in matches]
+			with self.lock:
+				counts[0] += len(lines)
+				counts[1] += 1 if lines else 0
+				counts[2] += 1
+
+			if lines and generation == self.generation:
+				self.post(lines)
+
+		if worker is not None:
+			with self.lock:
+				self.workers.discard(worker)
+
+			worker.release()
+
+	@staticmethod
+	def grepFile(path, pattern, isCancelled):
+		"""In-process fallback for GREP_WORKER_BOOTSTRAP's grepFile(..). Returns [(row, col, line text)]"""
+		matches = []
+		try:
+			with open(path, "rb") as file:
+				size = os.fstat(file.fileno()).st_size
+				if size == 0 or size > GREP_MAX_FILE_SIZE:
+					return matches
+
+				with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+					if data.find(b"\0", 0, 8192) >= 0:
+						return matches		# NOTE - Binary
+
+					row = 0
+					rowBegin = 0
+					for match in pattern.finditer(data):
+						if isCancelled():
+							return []
+
+						# NOTE - Only the stretch between matches gets copied out of the map, to count the lines in it
+						lineBegin = data.rfind(b"\n", 0, match.start()) + 1
+						row += data[rowBegin:lineBegin].count(b"\n")
+						rowBegin = lineBegin
+
+						lineEnd = data.find(b"\n", match.start())
+						lineEnd = len(data) if lineEnd < 0 else lineEnd
+						col = len(data[lineBegin:match.start()].decode("utf-8", "replace"))
+						matches.append((row, col, data[lineBegin:lineEnd].decode("utf-8", "replace").strip()))
+		except (OSError, ValueError):
+			return []		# NOTE - Unreadable, or can't be mapped
+
+		return matches
+
+	def post(self, lines):
+		with self.lock:
+			self.pending.extend(lines)
+
+	def flush(self, generation, panel):
+		if generation != self.generation:
+			return
+
+		with self.lock:
+			isFinished = self.finishedGeneration == generation
+			lines, self.pending = self.pending, []
+
+		if lines:
+			panel.run_command("append", { "characters": "".join(lines), "force": True, "scroll_to_end": False })
+
+		if not isFinished:
+			sublime.set_timeout(lambda: self.flush(generation, panel), GREP_FLUSH_MS)
+
+class AlsGrepDirectory(sublime_plugin.WindowCommand):
+	@instrumented
+	def run(self):
+		Grep.get(self.window).open()
 
 
 # --- Listeners/Hooks
 
+# NOTE - on_text_command runs for every command Sublime executes (every character typed, every cursor move...), so it only
+#  looks the command up here. Each handler takes (view, command_name, args) and returns None or a rewritten (command, args).
+#  The first handler to return non-None wins.
+
+TEXT_COMMAND_HANDLERS = {}
+TEXT_COMMAND_PURE_HANDLERS = set()	# NOTE - Rewrite depends only on (command, args, mark active) with no side effects. See CommandRewriter
+
+def addTextCommandHandler(command_names, handler, isPure=False):
+	for command_name in command_names:
+		TEXT_COMMAND_HANDLERS.setdefault(command_name, []).append(handler)
+
+	if isPure:
+		TEXT_COMMAND_PURE_HANDLERS.add(handler)
+
+def onMoveTextCommand(view, command_name, args):
+
+	# Maybe dispatch to input view
+
+	if view.element() == InputPanel.ELEMENT_NAME:
+		iSearch = ISearch.get(view.window())
+		return iSearch.onTextCommand(command_name, args)
+
+	# Extend moves
+
+	markSel = MarkSel.get(view)
+	if markSel.isMarkActive() and not args.get("extend", False):
+		args["extend"] = True
+		return (command_name, args)
+
+	return None
+
+def onKeepMarkTextCommand(view, command_name, args):
+	if view.element() == InputPanel.ELEMENT_NAME:
+		return None
+
+	# NOTE - on_modified doesn't know what command caused the modification,
+	#  We squirrel that info away so on_modified knows if it should drop the selection
+
+	markSel = MarkSel.get(view)
+	markSel.wantIgnoreModification += 1
+	markSel.wantKeepMark += 1
+	return None
+
+addTextCommandHandler(("move", "move_to"), onMoveTextCommand, isPure=True)	# NOTE - Only pure outside of panels
+addTextCommandHandler(("swap_line_up", "swap_line_down", "indent", "unindent"), onKeepMarkTextCommand)
+
 class AlsEventListener(sublime_plugin.EventListener):
 
 	instance = None
@@ -1066,36 +4123,22 @@ class AlsEventListener(sublime_plugin.EventListener):
 		AlsEventListener.instance = self
 		self.sync_views()
 
+	@instrumented
 	def on_text_command(self, view, command_name, args):
 
 		# IMPORTANT - Altering the return value feeds the altered command back into this function.
 		#  Only return a tuple if you have actually altered things, otherwise there is inifnite recursion!
 
-		trace(LOG_EVENTS, "text_command: " + command_name)
-
-		# Maybe dispatch to input view
-
-		if view.element() == InputPanel.ELEMENT_NAME:
-			iSearch = ISearch.get(view.window())
-			return iSearch.onTextCommand(command_name, args)
-
-		# Extend moves
+		trace(LOG_EVENTS, "text_command: {}", command_name)
 
-		markSel = MarkSel.get(view)
-		if command_name == "move" or command_name == "move_to":
-			if markSel.isMarkActive() and not args.get("extend", False):
-				args["extend"] = True
-				return (command_name, args)
-
-		# NOTE - on_modified doesn't know what command caused the modification,
-		#  We squirrel that info away so on_modified knows if it should drop the selection
+		handlers = TEXT_COMMAND_HANDLERS.get(command_name)
+		if handlers is None:
+			return None		# NOTE - Fast path for insert, scroll, etc. Doesn't touch any per-view state
 
-		elif command_name == "swap_line_up" or \
-			 command_name == "swap_line_down" or \
-			 command_name == "indent" or \
-			 command_name == "unindent":
-			markSel.wantIgnoreModification += 1
-			markSel.wantKeepMark += 1
+		for handler in handlers:
+			result = handler(view, command_name, args)
+			if result is not None:
+				return result
 
 		# Execute command unmodified
 
@@ -1111,6 +4154,7 @@ class AlsEventListener(sublime_plugin.EventListener):
 			markSel = MarkSel.get(view)
 			markSel.clearAll()
 
+	@instrumented
 	def on_modified(self, view):
 		# NOTE - Anything that affects contents of buffer will hook into
 		#  this function
@@ -1126,11 +4170,24 @@ class AlsEventListener(sublime_plugin.EventListener):
 		elif markSel.isMarkActive():
 			markSel.clearAll()
 
+	def on_query_context(self, view, key, operator, value, match_all):
+		if key != "als_has_build_errors":
+			return None
+
+		window = view.window()
+		errors = BuildScheduler.get(window).errors if window else None
+		hasErrors = errors is not None and bool(errors.entries or errors.pending)
+
+		if operator == sublime.OP_EQUAL:		return hasErrors == value
+		if operator == sublime.OP_NOT_EQUAL:	return hasErrors != value
+		return None
+
 	def on_window_command(self, window, command_name, args):
-		trace(LOG_EVENTS, "window_command: " + command_name)
+		trace(LOG_EVENTS, "window_command: {}", command_name)
 
 		return None
 
+	@instrumented
 	def on_activated(self, view):
 		if not view.file_name():	# unsaved file
 		    return
@@ -1153,7 +4210,7 @@ class AlsEventListener(sublime_plugin.EventListener):
 		# UGH - But this DOESN'T actually work because the view's window becomes None...
 		#  we don't have timing guarantees since this is the async version...
 
-		trace(LOG_EVENTS, "view deactivated (async): " + str(view.element()))
+		trace(LOG_EVENTS, "view deactivated (async): {}", view.element())
 
 		# Maybe dispatch to input view
 
@@ -1204,6 +4261,7 @@ class AlsEventListener(sublime_plugin.EventListener):
 
 		window.focus_group(active_group)
 
+	@instrumented
 	def on_load(self, view):
 		""" Called when a file is loaded/opened. """
 		filename = view.file_name()
@@ -1214,14 +4272,45 @@ class AlsEventListener(sublime_plugin.EventListener):
 		if not window:
 			return
 
+		BuildScheduler.get(window).errors.drawView(view)
+
 		is_transient = window.get_view_index(view)[1] == -1
 		if is_transient:
 			self.transient_filenames.add(filename)
 		else:
 			self.sync_views()
 
+	def on_load_async(self, view):
+		self.updateProjectIndex(view)
+
+	def on_post_save_async(self, view):
+		self.updateProjectIndex(view)
+
+		filename = view.file_name()
+		if filename:
+			ScriptDiscovery.onSaved(filename)
+			BuildScheduler.onSaved(filename)
+
+	def updateProjectIndex(self, view):
+		filename = view.file_name()
+		window = view.window()
+		if not filename or not window:
+			return
+
+		index = ProjectIndex.find(window)
+		if index is not None and index.isReady and index.contains(filename):
+			index.update(filename)
+
+	def on_pre_close_window(self, window):
+		WindowEx.evict(window.id())
+
+	@instrumented
 	def on_close(self, view):
 		""" Called when a file is closed. """
+		ViewEx.evict(view.id())
+		if not view.buffer().views():
+			BufferEx.dictionary.pop(view.buffer_id(), None)
+
 		filename = view.file_name()
 		window = sublime.active_window()
 		was_transient = filename in self.transient_filenames
@@ -1232,13 +4321,31 @@ class AlsEventListener(sublime_plugin.EventListener):
 		# Delay execution to allow Sublime to handle UI updates
 		sublime.set_timeout(lambda: self.sync_views([filename]), 100)
 
+class AlsTextChangeListener(sublime_plugin.TextChangeListener):
+
+	@classmethod
+	def is_applicable(cls, buffer):
+		return True
+
+	def on_text_changed(self, changes):
+		# NOTE - Runs for every edit in every buffer, so bail as early as possible
+
+		bufferEx = BufferEx.dictionary.get(self.buffer.id())
+		if bufferEx is None or bufferEx.iSearchMatches is None:
+			return
+
+		trace(LOG_EVENTS, "on_text_changed")
+		ISearch.onBufferTextChanged(bufferEx, changes)
+
 class AlsTestPanel1(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
 		print("t1")
 		inputPanel = InputPanel.get(self.window)
 		inputPanel.open("test 1")
 
 class AlsTestPanel2(sublime_plugin.WindowCommand):
+	@instrumented
 	def run(self):
 		print("t2")
 		inputPanel = InputPanel.get(self.window)
@@ -1256,11 +4363,11 @@ class InputPanel():
 
 	@staticmethod
 	def get(window):
-		trace(InputPanel.LOG_TAG, "getting i-search mgr for window " + str(window.id()))
+		trace(InputPanel.LOG_TAG, "getting i-search mgr for window {}", window.id())
 		return WindowEx.get(window).inputPanel
 
 	def onDeactivated(self):
-		trace(InputPanel.LOG_TAG, "onDeactivated(..), name = " + str(self.name))
+		trace(InputPanel.LOG_TAG, "onDeactivated(..), name = {}", self.name)
 		self.close()
 
 	def isShowing(self, name):
@@ -1270,7 +4377,7 @@ class InputPanel():
 	# TODO what to do if we are already showing and we get this call?
 	# Should we "re-open" and wire up new handlers?
 	def open(self, name, onDone=None, onChange=None, onCancel=None):
-		trace(InputPanel.LOG_TAG, "open(..), name = " + str(name))
+		trace(InputPanel.LOG_TAG, "open(..), name = {}", name)
 
 		if self.isShowing(name):
 			trace(InputPanel.LOG_TAG, "\tcalling focus_view(..)")
@@ -1279,10 +4386,10 @@ class InputPanel():
 			trace(InputPanel.LOG_TAG, "\tcalling show_input_panel(..)")
 			self.view = self.window.show_input_panel(name, "", self.on_done, None, self.on_cancel)
 			self.name = name
-			trace(InputPanel.LOG_TAG, "\tself.view = " + str(self.view))
+			trace(InputPanel.LOG_TAG, "\tself.view = {}", self.view)
 
 	def close(self):
-		trace(InputPanel.LOG_TAG, "close(..), name = " + str(self.name))
+		trace(InputPanel.LOG_TAG, "close(..), name = {}", self.name)
 		if self.isShowing(self.name):
 			trace(InputPanel.LOG_TAG, '\tcalling run_command("hide_panel")')
 			self.view.window().run_command("hide_panel")
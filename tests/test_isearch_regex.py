@@ -0,0 +1,72 @@
+# NOTE - Runs inside sublime through the UnitTesting package
+
+import shutil
+import time
+import unittest
+
+from .. import als_emacs
+
+
+class TestISearchRegexBudget(unittest.TestCase):
+
+	def setUp(self):
+		worker = als_emacs.RegexWorker.acquire()
+		if worker is None:
+			self.skipTest(f"can't start {als_emacs.ISEARCH_REGEX_WORKER_COMMAND} for regex workers")
+
+		worker.release()
+
+	def test_pathological_pattern_gives_up_within_budget(self):
+		pattern, error = als_emacs.ISearchRegex.compile("(a+)+b", 0)
+		self.assertIsNone(error)
+
+		start = time.perf_counter()
+		regions, error = als_emacs.ISearchRegex.scan(pattern, "a" * 26)
+		elapsed = time.perf_counter() - start
+
+		self.assertEqual(regions, [])
+		self.assertEqual(error, f"Regex gave up after {als_emacs.ISEARCH_REGEX_TIME_BUDGET_MS}ms")
+		self.assertLess(elapsed, als_emacs.ISEARCH_REGEX_TIME_BUDGET_MS / 1000 + 0.25)
+
+	def test_worker_recovers_after_giving_up(self):
+		pattern, _ = als_emacs.ISearchRegex.compile("(a+)+b", 0)
+		als_emacs.ISearchRegex.scan(pattern, "a" * 26)
+
+		pattern, _ = als_emacs.ISearchRegex.compile("fo+", 0)
+		regions, error = als_emacs.ISearchRegex.scan(pattern, "xfoo fo\nfooo")
+
+		self.assertIsNone(error)
+		self.assertEqual([(region.a, region.b) for region in regions], [(1, 4), (5, 7), (8, 12)])
+
+	def test_budget_only_covers_the_match(self):
+		# NOTE - Sending a big buffer across shouldn't count against the budget, only matching it should
+		pattern, _ = als_emacs.ISearchRegex.compile("fo+ ba", 0)
+		regions, error = als_emacs.ISearchRegex.scan(pattern, ("x" * 99 + "\n") * 200000 + "foo bar")
+
+		self.assertIsNone(error)
+		self.assertEqual(len(regions), 1)
+
+
+class TestRegexWorkerFallback(unittest.TestCase):
+
+	def setUp(self):
+		self.command = als_emacs.ISEARCH_REGEX_WORKER_COMMAND
+		self.idle, als_emacs.RegexWorker.idle = als_emacs.RegexWorker.idle, []
+
+	def tearDown(self):
+		als_emacs.ISEARCH_REGEX_WORKER_COMMAND = self.command
+		als_emacs.RegexWorker.idle = self.idle
+		als_emacs.RegexWorker.isUnavailable = False
+
+	def test_worker_that_exits_at_once_falls_back_to_in_process(self):
+		if shutil.which("true") is None:
+			self.skipTest("no 'true' to stand in for an interpreter that exits at once")
+
+		als_emacs.ISEARCH_REGEX_WORKER_COMMAND = "true"
+		pattern, _ = als_emacs.ISearchRegex.compile("fo+", 0)
+		for _ in range(2):
+			regions, error = als_emacs.ISearchRegex.scan(pattern, "xfoo fo")
+			self.assertIsNone(error)
+			self.assertEqual([(region.a, region.b) for region in regions], [(1, 4), (5, 7)])
+
+		self.assertTrue(als_emacs.RegexWorker.isUnavailable)
@@ -0,0 +1,87 @@
+# NOTE - Runs inside sublime through the UnitTesting package
+
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from .. import als_emacs
+
+
+class FakeJob():
+	"""Just enough of a BuildJob for WarmWorker.run(..)"""
+
+	def __init__(self, scriptFile):
+		self.scriptFile = scriptFile
+		self.isCancelled = False
+		self.lines = []
+
+	def post(self, line):
+		self.lines.append(line)
+
+	def output(self):
+		return "".join(self.lines)
+
+
+class TestWarmPythonWorker(unittest.TestCase):
+
+	COMMAND = "python3"		# NOTE - Stands in for python.exe, it gets the same bootstrap
+
+	def setUp(self):
+		if shutil.which(self.COMMAND) is None:
+			self.skipTest(f"no {self.COMMAND} to run warm workers with")
+
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+		self.addCleanup(als_emacs.WarmWorker.stopAll)
+
+	def write(self, name, text):
+		path = Path(self.directory.name, name)
+		path.write_text(text)
+		return path
+
+	def run_script(self, scriptFile):
+		worker = None
+		deadline = time.perf_counter() + 10
+		while worker is None and time.perf_counter() < deadline:
+			worker = als_emacs.WarmWorker.acquire(self.COMMAND)		# NOTE - None while a replacement is still starting
+			if worker is None:
+				time.sleep(0.05)
+
+		self.assertIsNotNone(worker)
+		job = FakeJob(scriptFile)
+		return worker.run(job), job.output()
+
+	def test_exit_codes(self):
+		self.assertEqual(self.run_script(self.write("ok.py", "print('hi')\n")), (0, "hi\n"))
+		self.assertEqual(self.run_script(self.write("exit.py", "import sys\nsys.exit(3)\n"))[0], 3)
+
+		exitCode, output = self.run_script(self.write("raise.py", "raise ValueError('boom')\n"))
+		self.assertEqual(exitCode, 1)
+		self.assertIn("ValueError: boom", output)
+
+	def test_script_modules_are_reloaded(self):
+		script = self.write("uses_helper.py", "import helper\nprint(helper.VALUE)\n")
+		self.write("helper.py", "VALUE = 1\n")
+		self.assertEqual(self.run_script(script), (0, "1\n"))
+
+		self.write("helper.py", "VALUE = 22\n")
+		self.assertEqual(self.run_script(script), (0, "22\n"))
+
+	def test_environment_and_atexit_dont_leak(self):
+		exitCode, output = self.run_script(self.write("leaky.py", (
+			"import atexit, os\n"
+			"os.environ['ALS_WARM_TEST'] = '1'\n"
+			"atexit.register(print, 'bye')\n")))
+		self.assertEqual((exitCode, output), (0, "bye\n"))
+
+		script = self.write("check.py", "import os\nprint(os.environ.get('ALS_WARM_TEST'))\n")
+		self.assertEqual(self.run_script(script), (0, "None\n"))
+
+	def test_worker_restarts_after_os_exit(self):
+		exitCode, output = self.run_script(self.write("hard_exit.py", "import os\nos._exit(5)\n"))
+		self.assertEqual(exitCode, 5)
+		self.assertIn("restarting it", output)
+
+		self.assertEqual(self.run_script(self.write("after.py", "print('still warm')\n")), (0, "still warm\n"))